@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -45,6 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware
+    'core.profiling.ProfilingMiddleware',
+    # Reads the query counts of ProfilingMiddleware
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,7 +90,9 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds workers keep their connection open between requests
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
@@ -133,5 +140,97 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# How media files are delivered, see core/media.py. 'sendfile' streams
+# them from the worker, zero-copy where the WSGI server's file_wrapper
+# uses sendfile(); 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache,
+# lighttpd) hand them to the front proxy, for nginx from an internal
+# location at ACCEL_PREFIX aliasing MEDIA_ROOT. Files whose name matches
+# the IMMUTABLE pattern are never rewritten, clients cache them for
+# MAX_AGE seconds.
+MEDIA_SERVING = {
+    'BACKEND': os.environ.get('MEDIA_SERVING_BACKEND', 'sendfile'),
+    'ACCEL_PREFIX': '/protected-media/',
+    # The content addressed recipe images; not their renditions, which
+    # are rendered again under the same name when the sizes change
+    'IMMUTABLE': r'uploads/recipe/[0-9a-f]{2}/[0-9a-f]{64}\.\w+',
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+# Resized copies generated for uploaded recipe images,
+# by the maximum length of their longest side in pixels
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': 160,
+    'medium': 640,
+}
+# Worker processes resizing images, 0 resizes them in the web process
+RECIPE_IMAGE_RENDITION_WORKERS = 2
+
 # core is name of the app, User is the name of model in our app we want to use as custom user model
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+# Cache for user.authentication.CachedTokenAuthentication, set
+# CACHE_ALIAS to one of CACHES to share it between worker processes.
+# Otherwise deactivations, password changes and deleted tokens only
+# invalidate the entries of the process handling them; other processes
+# keep accepting the token for up to TTL seconds
+AUTH_TOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 10,
+    'CACHE_ALIAS': os.environ.get('AUTH_TOKEN_CACHE_ALIAS'),
+}
+
+# Token buckets limiting the views that hash passwords, per client IP
+# and per email, as '<requests>/<period>'; set CACHE_ALIAS to one of
+# CACHES to share them between worker processes
+LOGIN_THROTTLES = {
+    'RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+        'signup_ip': '10/min',
+    },
+    'MAX_SIZE': 100000,
+    'CACHE_ALIAS': None,
+    # Reverse proxies in front of the app appending to X-Forwarded-For,
+    # clients are identified by REMOTE_ADDR without any
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Server-Timing headers on every response; requests sending HEADER with
+# the secret TOKEN are profiled with cProfile, the last MAX_PROFILES of
+# each process are listed to staff at /api/profiles/
+PROFILING = {
+    'SERVER_TIMING': True,
+    'HEADER': 'X-Profile',
+    'TOKEN': os.environ.get('PROFILING_TOKEN'),
+    'MAX_PROFILES': 50,
+}
+
+# Prometheus metrics served at /metrics, see core/metrics.py. With
+# several worker processes DIR must name a directory shared by them,
+# where each writes its metrics at most every FLUSH_INTERVAL seconds.
+# When TOKEN is set scrapes must send "Authorization: Bearer <token>".
+METRICS = {
+    'DIR': os.environ.get('PROMETHEUS_MULTIPROC_DIR'),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+# Serialize list responses from values() rows with compiled row mappers,
+# instead of DRF's serializers, see recipe/fastpath.py
+FAST_LIST_SERIALIZATION = False
+
+# Cache of recipe list responses, see recipe/cache.py; entries live in
+# each process unless CACHE_ALIAS names a shared cache, the versions
+# invalidating them are kept in the database either way
+RECIPE_LIST_CACHE = {
+    'MAX_SIZE': 1000,
+    'TTL': 60,
+    'CACHE_ALIAS': None,
+}
+
+# Deleted accounts are disabled at once and purged CHUNK_SIZE rows at a
+# time, see user/purge.py. Purges interrupted by a restart are finished
+# by the purge_accounts command, which must be scheduled, e.g. from cron
+ACCOUNT_PURGE = {
+    'CHUNK_SIZE': 1000,
+}
@@ -15,11 +15,20 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('health/', include('core.urls')),
+    path('metrics', core_views.metrics, name='metrics'),
+    path('api/profiles/', core_views.ProfileListView.as_view(),
+         name='profile-list'),
+    path('api/profiles/<int:profile_id>/',
+         core_views.ProfileDetailView.as_view(), name='profile-detail'),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', core_views.media,
+         name='media'),
+]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Connect before the first request rather than during it
+if os.environ.get('DB_PREWARM', '1') != '0':
+    from core.health import prewarm
+    prewarm()
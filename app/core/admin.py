@@ -27,6 +27,18 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def get_deleted_objects(self, objs, request):
+        # Users are purged chunk by chunk, don't collect their data to
+        # list it on the confirmation page
+        users = [str(obj) for obj in objs]
+        return users, {User._meta.verbose_name_plural: len(users)}, \
+            set(), []
+
+    def delete_queryset(self, request, queryset):
+        """Disable the selected users, purged after commit."""
+        for user in queryset:
+            user.delete()
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Tag)
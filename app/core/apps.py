@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Connect the handlers maintaining denormalized recipe fields
+        from core import signals  # noqa: F401
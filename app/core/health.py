@@ -0,0 +1,70 @@
+import logging
+import time
+
+from django.db import connections
+from django.db.utils import OperationalError
+
+
+logger = logging.getLogger(__name__)
+
+
+def ping(alias='default'):
+    """Run a round trip on a database, return its latency in seconds.
+
+    Connects first if needed, raises OperationalError when the database
+    can't be reached.
+    """
+    connection = connections[alias]
+    connection.ensure_connection()
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+def wait_for_database(alias='default', timeout=60, delay=0.1, max_delay=5,
+                      on_retry=None):
+    """Block until the database answers a ping, return its latency.
+
+    Retries with exponential backoff, delays are capped at max_delay.
+    on_retry(error, delay) is called before each sleep. The last
+    OperationalError is raised once timeout seconds have passed, a
+    timeout of None waits forever.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return ping(alias)
+        except OperationalError as error:
+            # Don't retry on a connection left broken by the failure
+            connections[alias].close()
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise
+            if on_retry is not None:
+                on_retry(error, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def prewarm():
+    """Open the persistent connections of this thread ahead of requests.
+
+    Only databases with CONN_MAX_AGE keep their connection past the
+    first request. Each connection is checked with a ping, failures are
+    logged and left to the readiness endpoint to report. Must run in the
+    worker itself, connections can't be shared with forked processes.
+    """
+    for alias in connections:
+        connection = connections[alias]
+        if not connection.settings_dict['CONN_MAX_AGE']:
+            continue
+        try:
+            latency = ping(alias)
+        except OperationalError:
+            connection.close()
+            logger.warning('Could not prewarm connection to %s', alias,
+                           exc_info=True)
+        else:
+            logger.info('Prewarmed connection to %s (%.1f ms)', alias,
+                        latency * 1000)
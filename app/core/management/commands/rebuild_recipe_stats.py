@@ -0,0 +1,38 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import RecipeStats
+
+
+class Command(BaseCommand):
+    """Django command recomputing the recipe summaries"""
+    help = ('Recompute the per tag recipe summaries from the recipes, for '
+            'backfills or after writes that bypassed the signals. Users '
+            'are rebuilt in batches, each in its own transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='user_ids', metavar='USER_ID',
+                            help='Only rebuild this user, repeatable.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        """Rebuild the summaries batch by batch"""
+        user_ids = options['user_ids'] or list(
+            get_user_model().objects.order_by('pk')
+            .values_list('pk', flat=True))
+        batch_size = options['batch_size']
+
+        start = time.perf_counter()
+        for first in range(0, len(user_ids), batch_size):
+            RecipeStats.objects.rebuild(user_ids[first:first + batch_size])
+            self.stdout.write(
+                f'{min(first + batch_size, len(user_ids))}/{len(user_ids)} '
+                f'users')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the recipe stats of {len(user_ids)} users in '
+            f'{time.perf_counter() - start:.1f} s'))
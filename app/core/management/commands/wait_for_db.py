@@ -1,23 +1,36 @@
-import time
-
-from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import wait_for_database
 
 
 class Command(BaseCommand):
     """Django command to pause execution until db is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default',
+                            help='Alias of the database to wait for.')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before failing, '
+                                 '0 waits forever.')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest pause between two attempts.')
+
     def handle(self, *args, **options):
-        """Wait for db to be ready and just exit"""
+        """Wait for db to accept connections and just exit"""
 
         self.stdout.write('Waiting for database')
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting one second')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+
+        def on_retry(error, delay):
+            self.stdout.write(
+                f'Database unavailable, waiting {delay:g} seconds')
+
+        try:
+            latency = wait_for_database(
+                options['database'], timeout=options['timeout'] or None,
+                max_delay=options['max_delay'], on_retry=on_retry)
+        except OperationalError as error:
+            raise CommandError(f'Database unavailable: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Database available! ({latency * 1000:.1f} ms)'))
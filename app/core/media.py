@@ -0,0 +1,200 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, \
+    SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, \
+    patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+
+BACKENDS = ('sendfile', 'x-accel-redirect', 'x-sendfile')
+
+# Bytes read at a time when a range is streamed by the worker
+BLOCK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts past the end of the file."""
+
+
+def get_config():
+    """Return the MEDIA_SERVING settings, with their defaults."""
+    config = {'BACKEND': 'sendfile', 'ACCEL_PREFIX': '/protected-media/',
+              'IMMUTABLE': None, 'MAX_AGE': 365 * 24 * 60 * 60}
+    config.update(getattr(settings, 'MEDIA_SERVING', {}))
+    if config['BACKEND'] not in BACKENDS:
+        raise ImproperlyConfigured(
+            f"MEDIA_SERVING['BACKEND'] must be one of {BACKENDS}")
+    return config
+
+
+def media_path(path):
+    """Return the normalized name of path below MEDIA_ROOT.
+
+    Raises Http404 for names escaping MEDIA_ROOT.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+    if name in ('', '.'):
+        raise Http404('Invalid media path')
+    return name
+
+
+def parse_range(header, size):
+    """Return the (start, stop) of the byte range header asks, or None.
+
+    Only single ranges are supported, None is returned for anything
+    else so the whole file is sent, as RFC 7233 allows.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range, the last bytes of the file
+        start, stop = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        stop = min(int(last) + 1, size) if last else size
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, stop
+
+
+class FileRange:
+    """Read only the bytes of a file between start and stop.
+
+    Has no fileno(), so WSGI servers stream it by reading instead of
+    sendfile()'ing the rest of the file.
+    """
+
+    def __init__(self, file, start, stop):
+        file.seek(start)
+        self.file = file
+        self.remaining = stop - start
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def _range_applies(request, etag, last_modified):
+    """Return whether the Range of request applies to this version."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _send_file(request, name):
+    """Return the response sending the file from this process."""
+    try:
+        file = open(os.path.join(settings.MEDIA_ROOT, name), 'rb')
+        stat = os.fstat(file.fileno())
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        raise Http404('Media file not found')
+
+    etag, last_modified = _etag(stat), int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        file.close()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if _range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'),
+                                     stat.st_size)
+        except RangeNotSatisfiable:
+            file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    content_type = mimetypes.guess_type(name)[0] or \
+        'application/octet-stream'
+    if request.method == 'HEAD':
+        file.close()
+        response = HttpResponse(content_type=content_type)
+        length = stat.st_size
+    elif byte_range is None:
+        # A whole file can be handed to the server's wsgi.file_wrapper,
+        # which sendfile()s it without copying it through Python
+        response = FileResponse(file, content_type=content_type)
+        length = stat.st_size
+    else:
+        start, stop = byte_range
+        response = FileResponse(FileRange(file, start, stop),
+                                content_type=content_type, status=206)
+        response.block_size = BLOCK_SIZE
+        response['Content-Range'] = \
+            f'bytes {start}-{stop - 1}/{stat.st_size}'
+        length = stop - start
+
+    response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def serve(request, path):
+    """Return the response delivering the media file at path.
+
+    With the x-accel-redirect (nginx) and x-sendfile (Apache, lighttpd)
+    backends the front proxy reads the file, handling ranges and
+    conditional requests itself; the worker only names it.
+    """
+    config = get_config()
+    name = media_path(path)
+
+    if config['BACKEND'] == 'sendfile':
+        response = _send_file(request, name)
+    else:
+        response = HttpResponse(
+            content_type=mimetypes.guess_type(name)[0] or
+            'application/octet-stream')
+        if config['BACKEND'] == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = \
+                config['ACCEL_PREFIX'].rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = os.path.join(settings.MEDIA_ROOT, name)
+
+    if response.status_code in (200, 206, 304):
+        if config['IMMUTABLE'] and re.fullmatch(config['IMMUTABLE'], name):
+            # Never rewritten under the same name, so clients needn't
+            # revalidate them
+            patch_cache_control(response, public=True, immutable=True,
+                                max_age=config['MAX_AGE'])
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,321 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+# Methods recorded by name, clients can send any other to grow the labels
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def _config():
+    return getattr(settings, 'METRICS', {})
+
+
+def _label_key(labelnames, labels):
+    """Return the sample key of a set of label values."""
+    if len(labels) != len(labelnames):
+        raise ValueError(f'Expected labels {labelnames}, got {set(labels)}')
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _encode(samples):
+    """Return samples keyed by label values with JSON keys."""
+    return {json.dumps(key): value for key, value in samples.items()}
+
+
+class Counter:
+    """Monotonic count, optionally split by labels."""
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        # The last slot counts values above every bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                # Per bucket counts, then the sum of the values
+                sample = self._values[key] = [0] * (len(self.buckets) + 2)
+            sample[index] += 1
+            sample[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(sample) for key, sample in self._values.items()}
+
+
+class Registry:
+    """The metrics of the process, and their aggregation across processes.
+
+    Updating a metric takes one short lock of that metric. When a
+    directory is configured, each process writes its snapshot to its
+    own file in it at most every flush_interval seconds, and the
+    exposition sums the files of all processes.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._last_flush = 0
+        if directory:
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_settings(cls):
+        """Create a registry configured by settings.METRICS."""
+        config = _config()
+        return cls(config.get('DIR'), config.get('FLUSH_INTERVAL', 5))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Duplicate metric {metric.name}')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self._register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self._register(Histogram(*args, **kwargs))
+
+    def collector(self, name, documentation, labelnames=()):
+        """Register a function returning the counts of a counter.
+
+        The function is called when the metrics are exported, and
+        returns {label values tuple: count}. For counters kept by other
+        objects, like cache hits.
+        """
+        def register(function):
+            self._collectors.append(
+                (name, documentation, tuple(labelnames), function))
+            return function
+        return register
+
+    def snapshot(self):
+        """Return the current metrics of this process, JSON serializable."""
+        metrics = {
+            metric.name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labels': metric.labelnames,
+                'buckets': getattr(metric, 'buckets', None),
+                'samples': _encode(metric.snapshot()),
+            }
+            for metric in self._metrics.values()
+        }
+        for name, documentation, labelnames, function in self._collectors:
+            metrics[name] = {
+                'type': 'counter', 'help': documentation,
+                'labels': labelnames, 'buckets': None,
+                'samples': _encode(function()),
+            }
+        return metrics
+
+    def _path(self):
+        return os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+
+    def flush(self):
+        """Write the snapshot of this process to its file."""
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        # Written aside and moved in place, so readers never see half.
+        # Metrics aren't worth failing a request, or the exit, over
+        try:
+            descriptor, partial = tempfile.mkstemp(dir=self.directory,
+                                                   suffix='.partial')
+        except OSError:
+            return
+        try:
+            with os.fdopen(descriptor, 'w') as output:
+                json.dump(self.snapshot(), output)
+            os.replace(partial, self._path())
+        except OSError:
+            if os.path.exists(partial):
+                os.unlink(partial)
+
+    def maybe_flush(self):
+        """Flush if the last flush is older than the flush interval."""
+        if self.directory and \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def collect(self):
+        """Return the metrics summed over every process."""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                # Removed or replaced meanwhile
+                continue
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, dict(metric, samples={}))
+                for key, value in metric['samples'].items():
+                    current = target['samples'].get(key)
+                    if current is None:
+                        target['samples'][key] = value
+                    elif isinstance(value, list):
+                        target['samples'][key] = [
+                            a + b for a, b in zip(current, value)]
+                    else:
+                        target['samples'][key] = current + value
+        return merged
+
+    def exposition(self):
+        """Return every metric in the Prometheus text format."""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f'# HELP {name} {_escape_help(metric["help"])}')
+            lines.append(f'# TYPE {name} {metric["type"]}')
+            for key, value in sorted(metric['samples'].items()):
+                labels = list(zip(metric['labels'], json.loads(key)))
+                if metric['type'] == 'histogram':
+                    lines.extend(_histogram_lines(
+                        name, labels, metric['buckets'], value))
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _histogram_lines(name, labels, buckets, sample):
+    cumulative = 0
+    for bound, count in zip([*buckets, '+Inf'], sample):
+        cumulative += count
+        bucket_labels = labels + [('le', str(bound))]
+        yield f'{name}_bucket{_labels(bucket_labels)} {cumulative}'
+    yield f'{name}_sum{_labels(labels)} {sample[-1]}'
+    yield f'{name}_count{_labels(labels)} {cumulative}'
+
+
+registry = Registry.from_settings()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time to serve requests, by view.',
+    ('view', 'method', 'status'))
+request_queries = registry.histogram(
+    'http_request_db_queries', 'Database queries per request, by view.',
+    ('view',), buckets=QUERY_BUCKETS)
+response_size = registry.histogram(
+    'http_response_size_bytes', 'Size of response bodies, by view.',
+    ('view',), buckets=SIZE_BUCKETS)
+
+
+def view_name(view_func, method):
+    """Return the name of a view, ViewSet.action for viewsets."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None)
+    if not actions:
+        return cls.__name__
+    # The same function serves every method of a route, the action is
+    # picked by the method; HEAD is served like GET
+    method = method.lower()
+    action = actions.get(method) or \
+        (actions.get('get') if method == 'head' else None)
+    if action is None:
+        # Not allowed, or OPTIONS
+        return cls.__name__
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Record the latency, query count and size of every response.
+
+    Reads the query count of core.profiling.ProfilingMiddleware, so it
+    goes after it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        request.metrics_view = 'unmatched'
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = request.metrics_view
+        if view is None:
+            # The metrics endpoint itself
+            return response
+        method = request.method if request.method in METHODS else 'other'
+        request_duration.observe(duration, view=view, method=method,
+                                 status=response.status_code)
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            request_queries.observe(timings.queries, view=view)
+        if not response.streaming:
+            response_size.observe(len(response.content), view=view)
+
+        registry.maybe_flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = None \
+            if getattr(view_func, 'skip_metrics', False) \
+            else view_name(view_func, request.method)
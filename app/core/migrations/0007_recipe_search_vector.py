@@ -0,0 +1,42 @@
+# Generated by Django 2.1.15 on 2026-10-18 16:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_related_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Backfill the vectors of existing recipes
+        migrations.RunSQL(
+            """
+            UPDATE core_recipe SET search_vector =
+                setweight(to_tsvector('english', title), 'A')
+                || setweight(to_tsvector('english', COALESCE((
+                    SELECT string_agg(t.name, ' ')
+                    FROM core_recipe_tags rt
+                    JOIN core_tag t ON t.id = rt.tag_id
+                    WHERE rt.recipe_id = core_recipe.id), '')), 'B')
+                || setweight(to_tsvector('english', COALESCE((
+                    SELECT string_agg(i.name, ' ')
+                    FROM core_recipe_ingredients ri
+                    JOIN core_ingredient i ON i.id = ri.ingredient_id
+                    WHERE ri.recipe_id = core_recipe.id), '')), 'B')
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+    ]
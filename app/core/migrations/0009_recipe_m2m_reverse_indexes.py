@@ -0,0 +1,69 @@
+from django.db import migrations
+
+
+# Single column indexes Django created for the m2m foreign keys, made
+# redundant by the composite indexes starting with the same column. The
+# names are only used to recreate them, they are dropped by definition
+REDUNDANT_INDEXES = [
+    ('core_recipe_tags_tag_id_10c0ffea', 'core_recipe_tags', 'tag_id'),
+    ('core_recipe_tags_recipe_id_7754231e', 'core_recipe_tags',
+     'recipe_id'),
+    ('core_recipe_ingredients_ingredient_id_a8fec9ee',
+     'core_recipe_ingredients', 'ingredient_id'),
+    ('core_recipe_ingredients_recipe_id_eeb7255a', 'core_recipe_ingredients',
+     'recipe_id'),
+]
+
+# Looked up in the catalog rather than by the name Django generated,
+# which depends on its version and on how the table was created
+DROP_SINGLE_COLUMN_INDEXES = """
+DO $$
+DECLARE
+    redundant regclass;
+BEGIN
+    FOR redundant IN
+        SELECT i.indexrelid::regclass FROM pg_index i
+        JOIN pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = '{table}'::regclass AND i.indnatts = 1
+            AND NOT i.indisunique AND i.indpred IS NULL
+            AND i.indexprs IS NULL AND a.attname = '{column}'
+    LOOP
+        EXECUTE 'DROP INDEX ' || redundant;
+    END LOOP;
+END $$
+"""
+
+
+class Migration(migrations.Migration):
+    """Index the recipe m2m tables from the tag/ingredient side.
+
+    The unique (recipe_id, tag_id) constraints serve lookups from a
+    recipe; the composite (tag_id, recipe_id) indexes serve lookups from
+    a tag or an ingredient (cascading deletes, usage counts) with index
+    only scans. The single column indexes both make redundant are
+    dropped, so writes maintain no more indexes than before.
+    """
+
+    dependencies = [
+        ('core', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX core_recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingr_ingr_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id)',
+            'DROP INDEX core_recipe_ingr_ingr_recipe_idx',
+        ),
+    ] + [
+        migrations.RunSQL(
+            DROP_SINGLE_COLUMN_INDEXES.format(table=table, column=column),
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})',
+        )
+        for name, table, column in REDUNDANT_INDEXES
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:23
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Summaries of the recipes stored before they were kept, as rebuilt by
+# RecipeStats.objects.rebuild() with the time buckets of this schema
+BACKFILL_SQL = """
+INSERT INTO core_recipestats
+    (user_id, tag_id, recipe_count, price_total, time_total, time_buckets)
+SELECT r.user_id, t.tag_id, COUNT(*), SUM(r.price), SUM(r.time_minutes),
+       ARRAY[COUNT(*) FILTER (WHERE r.time_minutes <= 15),
+             COUNT(*) FILTER (WHERE r.time_minutes > 15
+                              AND r.time_minutes <= 30),
+             COUNT(*) FILTER (WHERE r.time_minutes > 30
+                              AND r.time_minutes <= 60),
+             COUNT(*) FILTER (WHERE r.time_minutes > 60
+                              AND r.time_minutes <= 120),
+             COUNT(*) FILTER (WHERE r.time_minutes > 120)]::integer[]
+FROM core_recipe r
+CROSS JOIN LATERAL (
+    SELECT NULL::integer AS tag_id
+    UNION ALL
+    SELECT rt.tag_id FROM core_recipe_tags rt WHERE rt.recipe_id = r.id
+) t
+GROUP BY r.user_id, t.tag_id
+"""
+
+
+def backfill_stats(apps, schema_editor):
+    schema_editor.execute(BACKFILL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_m2m_reverse_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('time_total', models.BigIntegerField(default=0)),
+                ('time_buckets', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('tag', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='core.Tag')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        # Unique per user and tag, the row without a tag included
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_recipestats_user_tag_uniq '
+            'ON core_recipestats (user_id, (COALESCE(tag_id, 0)))',
+            'DROP INDEX core_recipestats_user_tag_uniq',
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
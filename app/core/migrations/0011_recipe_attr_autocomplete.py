@@ -0,0 +1,52 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+# (table, recipe through table, its column, name of the prefix index)
+TABLES = [
+    ('core_tag', 'core_recipe_tags', 'tag_id',
+     'core_tag_user_lower_name_idx'),
+    ('core_ingredient', 'core_recipe_ingredients', 'ingredient_id',
+     'core_ingr_user_lower_name_idx'),
+]
+
+
+class Migration(migrations.Migration):
+    """Count the recipes of tags and ingredients, index name prefixes.
+
+    text_pattern_ops lets LIKE 'prefix%' use the index whatever the
+    collation of the database.
+    """
+
+    dependencies = [
+        ('core', '0010_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ] + [
+        migrations.RunSQL(
+            f'UPDATE {table} SET usage = counts.count FROM ('
+            f'SELECT {column}, COUNT(*) AS count FROM {through} '
+            f'GROUP BY {column}) counts WHERE counts.{column} = {table}.id',
+            migrations.RunSQL.noop,
+        )
+        for table, through, column, index in TABLES
+    ] + [
+        migrations.RunSQL(
+            f'CREATE INDEX {index} '
+            f'ON {table} (user_id, lower(name) text_pattern_ops)',
+            f'DROP INDEX {index}',
+        )
+        for table, through, column, index in TABLES
+    ]
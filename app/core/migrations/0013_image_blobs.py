@@ -0,0 +1,34 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:46
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('ref_count', models.IntegerField(default=0)),
+            ],
+        ),
+        # References of the images stored before the counts were kept
+        migrations.RunSQL(
+            'INSERT INTO core_imageblob (name, ref_count) '
+            'SELECT image, COUNT(*) FROM core_recipe '
+            "WHERE image IS NOT NULL AND image <> '' GROUP BY image",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+    ]
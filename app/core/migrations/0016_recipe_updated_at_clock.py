@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-18 18:44
+
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='updated_at',
+            field=core.models.ClockDateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,10 +1,18 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Cast, Coalesce, Lower
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
 import uuid
 import os
 
+from core.storage import image_storage
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
@@ -43,11 +51,51 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Used to (de)activate users
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the account is disabled to be purged, see user.purge
+    deletion_requested_at = models.DateTimeField(null=True, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def delete(self, using=None, keep_parents=False):
+        """Disable the user, their data is purged once committed.
+
+        Chunk by chunk in transactions of their own, see user.purge,
+        instead of collecting every row to cascade; nothing is deleted
+        yet when this returns.
+        """
+        from user import purge
+
+        purge.request_deletion(self)
+        return 0, {}
+
+
+class RecipeAttrQuerySet(models.QuerySet):
+    """Queries shared by tags and ingredients."""
+
+    def refresh_usage(self):
+        """Recompute the number of recipes linked to each object."""
+        through = self.model.recipe_set.through
+        # The column of the through table pointing at this model
+        column = self.model._meta.model_name + '_id'
+        counts = through.objects \
+            .filter(**{column: models.OuterRef('pk')}) \
+            .values(column).annotate(count=models.Count('recipe_id')) \
+            .values('count')
+        return self.update(usage=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0))
+
+    def autocomplete(self, prefix, limit=10):
+        """Return the most used objects whose name starts with prefix.
+
+        Case insensitive, served by the (user, lower(name)) index; only
+        the matches are ranked, so filter on a user first.
+        """
+        return self.annotate(lower_name=Lower('name')) \
+            .filter(lower_name__startswith=prefix.lower()) \
+            .order_by('-usage', 'lower_name', 'id')[:limit]
+
 
 class Tag(models.Model):
     """Tag to be used for a recipe."""
@@ -58,6 +106,17 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE  # if you delete user, delete tags as well
     )
+    # Number of recipes with the tag, maintained by core.signals
+    usage = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the per-user listing and its pagination seeks
+            models.Index(fields=['user', '-name', 'id'],
+                         name='core_tag_user_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,11 +129,131 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of recipes using the ingredient, maintained by core.signals
+    usage = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-name', 'id'],
+                         name='core_ingr_user_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RelatedIdsArray(models.Subquery):
+    """Collect the single column returned by a subquery into an array."""
+    template = 'ARRAY(%(subquery)s)'
+    output_field = ArrayField(models.IntegerField())
+
+
+class ClockTimestamp(models.Func):
+    """Current time of the database, not frozen for the transaction."""
+    template = 'clock_timestamp()'
+    output_field = models.DateTimeField()
+
+
+class ClockDateTimeField(models.DateTimeField):
+    """A DateTimeField whose auto_now values come from ClockTimestamp.
+
+    The queries bumping the same column use it too, so every write is
+    stamped by the one clock.
+    """
+
+    def pre_save(self, model_instance, add):
+        if self.auto_now or (self.auto_now_add and add):
+            # Deferred, loaded from the row if read after the save
+            model_instance.__dict__.pop(self.attname, None)
+            return ClockTimestamp()
+        return super().pre_save(model_instance, add)
+
+
+class RecipeQuerySet(models.QuerySet):
+    # Text search configuration used to build and query search vectors
+    search_config = 'english'
+    # Models of the many to many fields
+    related_models = {'ingredients': Ingredient, 'tags': Tag}
+
+    def refresh_related(self):
+        """Recompute every field derived from tags and ingredients."""
+        tags = Recipe.tags.through.objects \
+            .filter(recipe_id=models.OuterRef('pk')) \
+            .order_by('tag_id').values('tag_id')
+        ingredients = Recipe.ingredients.through.objects \
+            .filter(recipe_id=models.OuterRef('pk')) \
+            .order_by('ingredient_id').values('ingredient_id')
+
+        # A single UPDATE, whatever the number of recipes; what they
+        # render changed, so they count as modified
+        return self.update(tag_ids=RelatedIdsArray(tags),
+                           ingredient_ids=RelatedIdsArray(ingredients),
+                           search_vector=self._search_vector(),
+                           updated_at=ClockTimestamp())
+
+    def refresh_search_vector(self):
+        """Recompute the search vector of the recipes."""
+        # Called when their title or the names they render changed
+        return self.update(search_vector=self._search_vector(),
+                           updated_at=ClockTimestamp())
+
+    def _search_vector(self):
+        """Return the expression computing a recipe's search vector."""
+        # Titles weigh more than tag and ingredient names in the ranking
+        vector = SearchVector('title', weight='A', config=self.search_config)
+        for relation, name in (('tags', 'tag__name'),
+                               ('ingredients', 'ingredient__name')):
+            names = getattr(Recipe, relation).through.objects \
+                .filter(recipe_id=models.OuterRef('pk')) \
+                .values('recipe_id') \
+                .annotate(names=StringAgg(name, ' ')).values('names')
+            vector += SearchVector(
+                models.Subquery(names, output_field=models.TextField()),
+                weight='B', config=self.search_config)
+
+        return vector
+
+    def search(self, text):
+        """Return recipes matching text, annotated with their rank."""
+        query = SearchQuery(text, config=self.search_config)
+        # Ranks are compared by pagination cursors, so use double
+        # precision values that survive a round trip through JSON
+        rank = Cast(
+            SearchRank(models.F('search_vector'), query),
+            models.FloatField())
+
+        return self.filter(search_vector=query).annotate(rank=rank)
+
+    def filter_tags(self, tag_ids, match_all=False):
+        """Return recipes having all (or any) of the given tags."""
+        lookup = 'contains' if match_all else 'overlap'
+        return self.filter(**{f'tag_ids__{lookup}': tag_ids})
+
+    def filter_ingredients(self, ingredient_ids, match_all=False):
+        """Return recipes having all (or any) of the given ingredients."""
+        lookup = 'contains' if match_all else 'overlap'
+        return self.filter(**{f'ingredient_ids__{lookup}': ingredient_ids})
+
+    def with_related_ids(self, fields=('ingredients', 'tags')):
+        """Prefetch only the tag and ingredient ids, as used by list views."""
+        # One extra query per relation in total instead of one per recipe
+        return self.prefetch_related(*[
+            models.Prefetch(field, queryset=self.related_models[field]
+                            .objects.only('id').order_by('id'))
+            for field in fields
+        ])
+
+    def with_related(self, fields=('ingredients', 'tags')):
+        """Prefetch the full tags and ingredients nested by detail views."""
+        return self.prefetch_related(*[
+            models.Prefetch(field, queryset=self.related_models[field]
+                            .objects.order_by('id'))
+            for field in fields
+        ])
+
+
 class Recipe(models.Model):
     """Recipe object."""
     # Many to one key for user = foreign key (one user per recipe)
@@ -91,7 +270,299 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
 
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Stored once per distinct content, see core.storage and ImageBlob
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path,
+                              storage=image_storage)
+    # Names of the resized copies of image generated so far,
+    # see recipe.renditions
+    image_renditions = ArrayField(models.CharField(max_length=32),
+                                  default=list, editable=False)
+
+    # Sorted copies of the ids in tags and ingredients, kept in sync by
+    # core.signals, so recipes can be filtered with GIN indexed array
+    # operators instead of joining the m2m tables
+    tag_ids = ArrayField(models.IntegerField(), default=list, editable=False)
+    ingredient_ids = ArrayField(models.IntegerField(), default=list,
+                                editable=False)
+    # The array holding the ids of each many to many field
+    related_id_fields = {'tags': 'tag_ids', 'ingredients': 'ingredient_ids'}
+    # Title, tag and ingredient names, maintained by core.signals
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Last change of the recipe, its tags and ingredients included; the
+    # queries maintaining the derived fields bump it too
+    updated_at = ClockDateTimeField(auto_now=True)
+
+    # Fields only written by the queries maintaining them
+    derived_fields = ('tag_ids', 'ingredient_ids', 'search_vector')
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'],
+                         name='core_recipe_user_id_idx'),
+            # Covers the count and latest change of a user's recipes
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_recipe_user_updated_idx'),
+            GinIndex(fields=['tag_ids'], name='core_recipe_tag_ids_idx'),
+            GinIndex(fields=['ingredient_ids'],
+                     name='core_recipe_ingr_ids_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='core_recipe_search_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save the recipe, without overwriting its derived fields."""
+        # The values on an instance loaded before its tags or ingredients
+        # changed are stale, so only the queries maintaining them write them
+        if not self._state.adding and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        # Compared with the saved image by core.signals, to count the
+        # references to the stored files without reading the row again
+        if 'image' in field_names:
+            recipe._loaded_image = values[field_names.index('image')] or ''
+        return recipe
 
     def __str__(self):
         return self.title
+
+
+class RecipeStatsQuerySet(models.QuerySet):
+    # Adds the signed contributions of the source rows to the summaries
+    upsert_sql = '''
+        INSERT INTO core_recipestats AS stats
+            (user_id, tag_id, recipe_count, price_total, time_total,
+             time_buckets)
+        SELECT user_id, tag_id, SUM(sign), SUM(sign * price),
+               SUM(sign * time_minutes), ARRAY[{buckets}]
+        FROM ({source}) AS source
+        GROUP BY user_id, tag_id
+        ON CONFLICT (user_id, (COALESCE(tag_id, 0))) DO UPDATE SET
+            recipe_count = stats.recipe_count + EXCLUDED.recipe_count,
+            price_total = stats.price_total + EXCLUDED.price_total,
+            time_total = stats.time_total + EXCLUDED.time_total,
+            time_buckets = ARRAY(
+                SELECT old + new
+                FROM unnest(stats.time_buckets, EXCLUDED.time_buckets)
+                    WITH ORDINALITY AS buckets (old, new, position)
+                ORDER BY position)
+    '''
+    # Each recipe once without a tag, for the totals, and once per tag
+    recipes_sql = '''
+        SELECT r.user_id, t.tag_id, %s AS sign, r.price, r.time_minutes
+        FROM core_recipe r
+        CROSS JOIN LATERAL (
+            SELECT NULL::integer AS tag_id
+            UNION ALL
+            SELECT rt.tag_id FROM core_recipe_tags rt
+            WHERE rt.recipe_id = r.id
+        ) t
+        WHERE {condition}
+    '''
+    links_sql = '''
+        SELECT r.user_id, rt.tag_id, %s AS sign, r.price, r.time_minutes
+        FROM core_recipe_tags rt
+        JOIN core_recipe r ON r.id = rt.recipe_id
+        WHERE {condition}
+    '''
+
+    def _bucket_sums(self):
+        """Return the SQL counting the source rows of each time bucket."""
+        bounds = [None, *self.model.TIME_BUCKETS, None]
+        sums = []
+        for lower, upper in zip(bounds, bounds[1:]):
+            conditions = []
+            if lower is not None:
+                conditions.append(f'time_minutes > {lower:d}')
+            if upper is not None:
+                conditions.append(f'time_minutes <= {upper:d}')
+            sums.append(f'COALESCE(SUM(sign) FILTER '
+                        f'(WHERE {" AND ".join(conditions)}), 0)::integer')
+        return ', '.join(sums)
+
+    def _upsert(self, source, params):
+        sql = self.upsert_sql.format(buckets=self._bucket_sums(),
+                                     source=source)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def record(self, recipe_ids, sign=1):
+        """Add (or with sign -1 remove) recipes to their summaries.
+
+        Reads the recipes and their tags as currently stored, so removing
+        has to happen before they change and adding after.
+        """
+        if recipe_ids:
+            self._upsert(self.recipes_sql.format(condition='r.id = ANY(%s)'),
+                         [sign, list(recipe_ids)])
+
+    def record_links(self, sign, recipe_ids=None, tag_ids=None):
+        """Add (or remove) recipes to the summaries of tags they're linked to.
+
+        Only existing links count, restricted to recipe_ids and tag_ids.
+        """
+        conditions, params = ['TRUE'], [sign]
+        for column, ids in (('rt.recipe_id', recipe_ids),
+                            ('rt.tag_id', tag_ids)):
+            if ids is not None:
+                conditions.append(f'{column} = ANY(%s)')
+                params.append(list(ids))
+        self._upsert(
+            self.links_sql.format(condition=' AND '.join(conditions)),
+            params)
+
+    def rebuild(self, user_ids=None):
+        """Recompute the summaries of the users, or of every user."""
+        with transaction.atomic(using=self.db):
+            if user_ids is None:
+                self.all().delete()
+                condition, params = 'TRUE', [1]
+            else:
+                self.filter(user_id__in=user_ids).delete()
+                condition, params = 'r.user_id = ANY(%s)', [1, list(user_ids)]
+            self._upsert(self.recipes_sql.format(condition=condition),
+                         params)
+
+
+class RecipeStats(models.Model):
+    """Summary of the recipes of a user having a tag.
+
+    The row without a tag summarizes all of the user's recipes. Rows are
+    updated incrementally by core.signals as recipes and their tags
+    change; the rebuild_recipe_stats command recomputes them.
+    """
+    # Upper bounds of the time_minutes buckets, the last bucket has the
+    # recipes taking longer
+    TIME_BUCKETS = (15, 30, 60, 120)
+
+    # Indexed by the unique (user_id, COALESCE(tag_id, 0)) index of the
+    # migration, which the upserts rely on
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey('Tag', null=True, on_delete=models.CASCADE)
+    recipe_count = models.IntegerField(default=0)
+    price_total = models.DecimalField(max_digits=14, decimal_places=2,
+                                      default=0)
+    time_total = models.BigIntegerField(default=0)
+    # Recipe counts per bucket of TIME_BUCKETS
+    time_buckets = ArrayField(models.IntegerField(), default=list)
+
+    objects = RecipeStatsQuerySet.as_manager()
+
+
+class ImageBlobQuerySet(models.QuerySet):
+
+    def record(self, names, sign=1):
+        """Add sign times the occurrences of names to their counts."""
+        names = [name for name in names if name]
+        if not names:
+            return
+        if sign > 0:
+            sql = """
+                INSERT INTO core_imageblob AS blob (name, ref_count)
+                SELECT name, %s * COUNT(*) FROM unnest(%s::varchar[]) name
+                GROUP BY name
+                ON CONFLICT (name) DO UPDATE
+                    SET ref_count = blob.ref_count + EXCLUDED.ref_count
+            """
+        else:
+            # Files stored before the counts were kept have no row
+            sql = """
+                UPDATE core_imageblob AS blob
+                SET ref_count = blob.ref_count + counts.ref_count
+                FROM (SELECT name, %s * COUNT(*) AS ref_count
+                      FROM unnest(%s::varchar[]) name GROUP BY name) counts
+                WHERE blob.name = counts.name
+            """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [sign, names])
+
+    def lock(self, names):
+        """Lock the rows of names until the transaction ends.
+
+        Returns the reference counts by name. Missing rows are created
+        without references, so files not counted yet are locked as well;
+        names too long to be counted are skipped.
+        """
+        max_length = self.model._meta.get_field('name').max_length
+        names = sorted({name for name in names if len(name) <= max_length})
+        if not names:
+            return {}
+        # Sorted, so concurrent locks of overlapping names don't deadlock
+        with connections[self.db].cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO core_imageblob AS blob (name, ref_count)
+                SELECT name, 0 FROM unnest(%s::varchar[]) name
+                ORDER BY name
+                ON CONFLICT (name) DO UPDATE SET ref_count = blob.ref_count
+                RETURNING name, ref_count
+            """, [names])
+            return dict(cursor.fetchall())
+
+
+class ImageBlob(models.Model):
+    """A stored recipe image file and the number of recipes using it.
+
+    core.storage names files by their content, so recipes with the same
+    image share a file; ref_count is kept in sync by core.signals.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    ref_count = models.IntegerField(default=0)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeVersionQuerySet(models.QuerySet):
+
+    def current(self, user_id):
+        """Return the version of the user's recipes and when it changed."""
+        row = self.filter(user_id=user_id) \
+            .values_list('version', 'changed_at').first()
+        return row or (0, None)
+
+    def bump(self, user_id):
+        """Move the user's recipes to a new version.
+
+        Runs in the writing transaction, so other processes see the new
+        version exactly when the write commits.
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO core_recipeversion AS current
+                    (user_id, version, changed_at)
+                VALUES (%s, 1, clock_timestamp())
+                ON CONFLICT (user_id) DO UPDATE SET
+                    version = current.version + 1,
+                    changed_at = EXCLUDED.changed_at
+            """, [user_id])
+
+
+class RecipeVersion(models.Model):
+    """Counter of the writes to a user's recipes, tags and ingredients.
+
+    Keys the cached recipe lists, see recipe.cache; users without a row
+    are at version 0.
+    """
+    # Without a constraint, as the recipes deleted with a user bump the
+    # version again after the row is collected; the leftover is harmless
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE, primary_key=True,
+                                db_constraint=False)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True)
+
+    objects = RecipeVersionQuerySet.as_manager()
@@ -0,0 +1,174 @@
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+
+
+class RequestTimings:
+    """Where the time of a request went.
+
+    db covers the SQL queries, serialize the rendering of the response
+    after the view returned it, app everything else.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_end = None
+        self.end = None
+        self.queries = 0
+        self.db = 0.
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper timing each query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    @property
+    def total(self):
+        return self.end - self.start
+
+    @property
+    def serialize(self):
+        return 0. if self.view_end is None else self.end - self.view_end
+
+    @property
+    def app(self):
+        return self.total - self.serialize - self.db
+
+    def header(self):
+        """Return the value of the Server-Timing header."""
+        return ', '.join([
+            f'db;dur={self.db * 1000:.3f};desc="{self.queries} queries"',
+            f'app;dur={self.app * 1000:.3f}',
+            f'serialize;dur={self.serialize * 1000:.3f}',
+            f'total;dur={self.total * 1000:.3f}',
+        ])
+
+
+class ProfileBuffer:
+    """Ring buffer of the last profiled requests.
+
+    The oldest profile is dropped when max_size is reached, profiles are
+    kept per process.
+    """
+
+    def __init__(self, max_size=50):
+        self.max_size = max_size
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, request, response, timings, profile):
+        """Store the profile of a finished request, return its id."""
+        profile.create_stats()
+        entry = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'created': time.time(),
+            'total_ms': round(timings.total * 1000, 3),
+            'queries': timings.queries,
+            # The format of pstats dump files
+            'stats': marshal.dumps(profile.stats),
+        }
+        with self._lock:
+            entry['id'] = next(self._ids)
+            self._profiles[entry['id']] = entry
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+        return entry['id']
+
+    def get(self, profile_id):
+        """Return the stored profile with profile_id, or None."""
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self):
+        """Return the stored profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    @staticmethod
+    def report(entry, sort='cumulative', limit=50):
+        """Return the pstats report of a stored profile."""
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        stats.stats = marshal.loads(entry['stats'])
+        stats.get_top_level_stats()
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+def _config():
+    return getattr(settings, 'PROFILING', {})
+
+
+profiles = ProfileBuffer(_config().get('MAX_PROFILES', 50))
+
+
+class ProfilingMiddleware:
+    """Time every request, and profile the ones that ask for it.
+
+    Adds a Server-Timing header with the SQL count and time, the time
+    spent rendering the response and the total time. Requests sending
+    the header named by PROFILING['HEADER'] with the secret
+    PROFILING['TOKEN'] are also run under cProfile, their profile is
+    stored in the ring buffer read by the profiles endpoint and its id
+    returned in X-Profile-Id. Without a token nothing is profiled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _profile_requested(self, request):
+        config = _config()
+        token = config.get('TOKEN')
+        if not token:
+            return False
+        header = 'HTTP_' + config.get('HEADER', 'X-Profile') \
+            .upper().replace('-', '_')
+        return hmac.compare_digest(
+            request.META.get(header, '').encode(), token.encode())
+
+    def __call__(self, request):
+        timings = request.timings = RequestTimings()
+        profile = cProfile.Profile() \
+            if self._profile_requested(request) else None
+
+        with connection.execute_wrapper(timings.execute):
+            if profile is not None:
+                profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profile is not None:
+                    profile.disable()
+        timings.end = time.perf_counter()
+
+        if _config().get('SERVER_TIMING', True):
+            response['Server-Timing'] = timings.header()
+        if profile is not None:
+            response['X-Profile-Id'] = str(
+                profiles.add(request, response, timings, profile))
+        return response
+
+    def process_template_response(self, request, response):
+        # Called once the view returned, before the response is rendered
+        request.timings.view_end = time.perf_counter()
+        return response
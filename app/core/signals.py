@@ -0,0 +1,181 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, ImageBlob, Recipe, RecipeStats
+
+# Recipe fields summarized by RecipeStats
+STATS_FIELDS = {'price', 'time_minutes'}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_recipe_related(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Keep the denormalized recipe fields in sync with the m2m tables."""
+    if reverse and action == 'pre_clear':
+        # The recipes losing this tag or ingredient are gone afterwards
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).refresh_related()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_usage(sender, instance, action, reverse, model, pk_set,
+                  **kwargs):
+    """Keep the recipe counts of tags and ingredients in sync."""
+    cleared = f'_cleared_{model._meta.model_name}_ids'
+    if not reverse and action == 'pre_clear':
+        # The tags or ingredients losing this recipe are gone afterwards
+        setattr(instance, cleared, list(
+            model.objects.filter(recipe=instance)
+            .values_list('id', flat=True)))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        model, ids = type(instance), [instance.pk]
+    elif action == 'post_clear':
+        ids = instance.__dict__.pop(cleared, [])
+    else:
+        ids = pk_set
+
+    if ids:
+        model.objects.filter(pk__in=ids).refresh_usage()
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_related(sender, instance, **kwargs):
+    """Note the tags and ingredients of a recipe before it's deleted."""
+    # Their links are deleted by the cascade, without m2m signals
+    instance._deleted_related_ids = Recipe.objects.filter(pk=instance.pk) \
+        .values_list('tag_ids', 'ingredient_ids').first()
+
+
+@receiver(post_delete, sender=Recipe)
+def refresh_deleted_recipe_usage(sender, instance, **kwargs):
+    """Stop counting a deleted recipe in its tags and ingredients."""
+    related_ids = instance.__dict__.pop('_deleted_related_ids', None)
+    if related_ids is None:
+        return
+    for model, ids in zip((Tag, Ingredient), related_ids):
+        if ids:
+            model.objects.filter(pk__in=ids).refresh_usage()
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    """Index the title of a saved recipe."""
+    if update_fields is None or 'title' in update_fields:
+        Recipe.objects.filter(pk=instance.pk).refresh_search_vector()
+
+
+@receiver(post_save, sender=Tag)
+def refresh_renamed_tag(sender, instance, created, **kwargs):
+    """Reindex the recipes linked to a renamed tag."""
+    if not created:
+        Recipe.objects.filter(tag_ids__contains=[instance.pk]) \
+            .refresh_search_vector()
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_renamed_ingredient(sender, instance, created, **kwargs):
+    """Reindex the recipes linked to a renamed ingredient."""
+    if not created:
+        Recipe.objects.filter(ingredient_ids__contains=[instance.pk]) \
+            .refresh_search_vector()
+
+
+@receiver(post_delete, sender=Tag)
+def remove_deleted_tag(sender, instance, **kwargs):
+    """Drop a deleted tag from the recipes it was linked to."""
+    Recipe.objects.filter(tag_ids__contains=[instance.pk]).refresh_related()
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_deleted_ingredient(sender, instance, **kwargs):
+    """Drop a deleted ingredient from the recipes it was linked to."""
+    Recipe.objects.filter(ingredient_ids__contains=[instance.pk]) \
+        .refresh_related()
+
+
+@receiver(pre_save, sender=Recipe)
+def remove_changed_recipe_stats(sender, instance, update_fields, **kwargs):
+    """Take a recipe out of its summaries before its values change."""
+    if instance._state.adding or \
+            update_fields is not None and not STATS_FIELDS & update_fields:
+        return
+    RecipeStats.objects.record([instance.pk], -1)
+    instance._stats_removed = True
+
+
+@receiver(post_save, sender=Recipe)
+def add_saved_recipe_stats(sender, instance, created, **kwargs):
+    """Add a created or changed recipe to its summaries."""
+    if created or instance.__dict__.pop('_stats_removed', False):
+        RecipeStats.objects.record([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_stats(sender, instance, **kwargs):
+    """Take a recipe out of its summaries while its tags are known."""
+    RecipeStats.objects.record([instance.pk], -1)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tag_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    """Move recipes in and out of the summaries of their tags."""
+    # Links are counted as stored, so after adding and before removing
+    sign = {'post_add': 1, 'pre_remove': -1, 'pre_clear': -1}.get(action)
+    if sign is None or pk_set is not None and not pk_set:
+        return
+
+    ids = {'recipe_ids': pk_set, 'tag_ids': [instance.pk]} if reverse \
+        else {'recipe_ids': [instance.pk], 'tag_ids': pk_set}
+    RecipeStats.objects.record_links(sign, **ids)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, update_fields, **kwargs):
+    """Note the stored image of a recipe saved without loading it."""
+    if instance.pk is None or '_loaded_image' in instance.__dict__ or \
+            update_fields is not None and 'image' not in update_fields:
+        return
+    instance._loaded_image = Recipe.objects.filter(pk=instance.pk) \
+        .values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe_image(sender, instance, created, update_fields,
+                             **kwargs):
+    """Move a recipe's reference from its previous image to its new one."""
+    if not created and update_fields is not None and \
+            'image' not in update_fields:
+        return
+    previous = '' if created else instance.__dict__.get('_loaded_image', '')
+    current = instance.image.name or ''
+    if current != previous:
+        ImageBlob.objects.record([current])
+        ImageBlob.objects.record([previous], -1)
+    instance._loaded_image = current
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe_image(sender, instance, **kwargs):
+    """Drop the reference of a deleted recipe to its image."""
+    if instance.__dict__.get('image'):
+        ImageBlob.objects.record([instance.image.name], -1)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import uuid
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the SHA-256 of their content.
+
+    The basename chosen by upload_to is replaced by the digest, keeping
+    its lowercased extension, in a subdirectory of its first two hex
+    digits. Content that is already stored isn't written again, its
+    existing name is returned, so files never change once written.
+
+    Saving locks the file's ImageBlob row, so the image sweeper can't
+    delete a reused file before the reference to it is counted; save
+    and count in one transaction.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        directory, filename = os.path.split(self.generate_filename(name))
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage name "{name}" exceeds {max_length} characters')
+
+        name = name.replace('\\', '/')
+
+        apps.get_model('core', 'ImageBlob').objects.lock([name])
+        try:
+            # Reused files count as new for the grace period of the
+            # image sweeper, which may have found them unreferenced
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        """Write content at name, atomically."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write next to the target and move it in place, so concurrent
+        # saves of the same content never expose a partial file
+        partial = f'{path}.{uuid.uuid4().hex}.partial'
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                file_move_safe(content.temporary_file_path(), partial)
+            else:
+                with open(partial, 'wb') as file:
+                    for chunk in content.chunks():
+                        file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(partial, self.file_permissions_mode)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+
+image_storage = ContentAddressedStorage()
@@ -1,7 +1,10 @@
-from django.test import TestCase, Client
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import Recipe
+
 
 class AdminSiteTests(TestCase):
 
@@ -43,3 +46,62 @@ class AdminSiteTests(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_delete_user_disables(self):
+        """Test that deleting a user from the admin disables them."""
+        Recipe.objects.create(user=self.user, title='Cake', time_minutes=5,
+                              price='1.00')
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+
+        response = self.client.get(url)
+        self.assertContains(response, self.user.email)
+        response = self.client.post(url, {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+        # Purged after the admin's transaction commits
+        self.assertTrue(Recipe.objects.exists())
+
+
+class AdminPurgeTests(TransactionTestCase):
+    """Test purging the users deleted from the admin."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@londenappdev.com', password='test123'
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='test@londenappdev.com', password='test123'
+        )
+        Recipe.objects.create(user=self.user, title='Cake', time_minutes=5,
+                              price='1.00')
+
+    def test_delete_user_purges_after_commit(self):
+        """Test that the purge runs outside the admin's transaction."""
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+
+        with transaction.atomic():
+            response = self.client.post(url, {'post': 'yes'})
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(Recipe.objects.exists())
+
+        self.assertEqual(list(get_user_model().objects.all()),
+                         [self.admin_user])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_delete_selected_users_purges(self):
+        """Test that the delete selected action purges the users."""
+        url = reverse('admin:core_user_changelist')
+
+        response = self.client.post(url, {'action': 'delete_selected',
+                                          '_selected_action': [self.user.id],
+                                          'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(get_user_model().objects.all()),
+                         [self.admin_user])
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.cache import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+
+    def test_get_set(self):
+        """Test that cached values are returned and counted as hits."""
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Touch a, so b becomes the least recently used entry
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.evictions, 1)
+
+    @patch('time.monotonic')
+    def test_expired_entries_missing(self, mock_monotonic):
+        """Test that entries older than the ttl are not returned."""
+        mock_monotonic.return_value = 100
+        cache = LRUCache(ttl=10)
+        cache.set('a', 1)
+
+        mock_monotonic.return_value = 109
+        self.assertEqual(cache.get('a'), 1)
+        mock_monotonic.return_value = 110
+        self.assertIsNone(cache.get('a'))
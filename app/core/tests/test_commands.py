@@ -1,6 +1,7 @@
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -9,24 +10,39 @@ class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available."""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+        # ping really connects, unlike looking the connection up
+        with patch('core.health.ping') as ping:
             # Whenever this is called, it's overwritten with mock object,
-            # always returning True,
             # and you are able to monitor number of times the function
             # was called, etc.
-            gi.return_value = True
+            ping.return_value = 0.001
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(ping.call_count, 1)
 
     # Using as a decorator does the same as a with-command
     # You need to add it as an extra argument (ts in this case)
     # time.sleep will now just return true, hence not actually sleeping
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db."""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+        """Test waiting for db with exponential backoff."""
+        with patch('core.health.ping') as ping:
             # Function will raise OperationalError 5 times,
             # and not anymore on 6th time
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            ping.side_effect = [OperationalError] * 5 + [0.001]
+            call_command('wait_for_db', max_delay=1)
+            self.assertEqual(ping.call_count, 6)
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test that waiting fails once the timeout has passed."""
+        with patch('core.health.ping') as ping, \
+                patch('time.monotonic') as monotonic:
+            ping.side_effect = OperationalError('refused')
+            monotonic.side_effect = [0, 0, 2]
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=2)
+
+        self.assertEqual(ping.call_count, 2)
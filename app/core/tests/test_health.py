@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health
+
+
+LIVE_URL = reverse('health:live')
+READY_URL = reverse('health:ready')
+
+
+class HealthTests(TestCase):
+    """Test the liveness and readiness endpoints."""
+
+    def test_liveness_skips_database(self):
+        """Test that liveness doesn't query the database."""
+        with self.assertNumQueries(0):
+            res = self.client.get(LIVE_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_readiness_reports_latency(self):
+        """Test that readiness measures a database round trip."""
+        with self.assertNumQueries(1):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, 200)
+        database = res.json()['databases']['default']
+        self.assertEqual(database['status'], 'ok')
+        self.assertGreater(database['latency_ms'], 0)
+
+    @patch('core.views.ping', side_effect=OperationalError('refused'))
+    def test_readiness_database_down(self, ping):
+        """Test that readiness fails when the database is down."""
+        with patch.object(connection, 'close') as close, \
+                self.assertLogs('core.views', 'WARNING') as logs:
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, 503)
+        # Connection details are logged, not exposed
+        self.assertEqual(res.json()['databases']['default'],
+                         {'status': 'unavailable'})
+        self.assertIn('refused', logs.output[0])
+        close.assert_called_once_with()
+
+    def test_prewarm_persistent_connections(self):
+        """Test that only persistent connections are prewarmed."""
+        with patch('core.health.ping') as ping, \
+                patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            health.prewarm()
+            ping.assert_not_called()
+
+        with patch('core.health.ping') as ping, \
+                patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+            ping.return_value = 0.001
+            health.prewarm()
+            ping.assert_called_once_with('default')
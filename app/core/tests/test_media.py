@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.media import RangeNotSatisfiable, parse_range
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+CONTENT = bytes(range(256)) * 4
+
+# Named by content, see core.storage
+IMAGE = 'uploads/recipe/ab/' + 'ab' * 32 + '.jpg'
+RENDITION = 'uploads/recipe/ab/renditions/' + 'ab' * 32 + '_thumbnail.jpg'
+
+
+def media_url(name):
+    return reverse('media', args=[name])
+
+
+def read(response):
+    return b''.join(response.streaming_content)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(TestCase):
+    """Test delivering media files, ranges and cache headers."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'uploads', 'recipe', 'ab',
+                                 'renditions'), exist_ok=True)
+        for name in (IMAGE, RENDITION, 'export.bin'):
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_whole_file(self):
+        """Test that files are streamed with long lived cache headers."""
+        res = self.client.get(media_url(IMAGE))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(read(res), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    def test_mutable_files_revalidated(self):
+        """Test that files not named by content are revalidated."""
+        for name in ('export.bin', RENDITION):
+            res = self.client.get(media_url(name))
+
+            self.assertIn('no-cache', res['Cache-Control'])
+            self.assertNotIn('immutable', res['Cache-Control'])
+            self.assertEqual(read(res), CONTENT)
+
+    def test_range(self):
+        """Test sending part of a file."""
+        res = self.client.get(media_url(IMAGE),
+                              HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(read(res), CONTENT[10:20])
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+
+    def test_range_not_satisfiable(self):
+        """Test that ranges past the end of the file are rejected."""
+        res = self.client.get(media_url(IMAGE),
+                              HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_if_range(self):
+        """Test that ranges of another version send the whole file."""
+        url = media_url(IMAGE)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_RANGE='bytes=0-9',
+                              HTTP_IF_RANGE=etag)
+        self.assertEqual(res.status_code, 206)
+
+        res = self.client.get(url, HTTP_RANGE='bytes=0-9',
+                              HTTP_IF_RANGE='"stale"')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(read(res), CONTENT)
+
+    def test_not_modified(self):
+        """Test revalidating a file."""
+        url = media_url(IMAGE)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_missing_and_escaping_paths(self):
+        """Test that only existing files below MEDIA_ROOT are served."""
+        for name in ('uploads/recipe/missing.jpg', 'uploads',
+                     '../etc/passwd', 'uploads/../../etc/passwd'):
+            res = self.client.get(media_url(name))
+            self.assertEqual(res.status_code, 404, name)
+
+    def test_head(self):
+        """Test that HEAD requests read no content."""
+        res = self.client.head(media_url(IMAGE))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVING={'BACKEND': 'x-accel-redirect',
+                                      'ACCEL_PREFIX': '/protected/',
+                                      'IMMUTABLE': r'uploads/.*'})
+    def test_x_accel_redirect(self):
+        """Test handing the file to nginx without opening it."""
+        res = self.client.get(media_url('uploads/recipe/missing.jpg'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'],
+                         '/protected/uploads/recipe/missing.jpg')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVING={'BACKEND': 'x-sendfile'})
+    def test_x_sendfile(self):
+        """Test handing the file to Apache or lighttpd."""
+        res = self.client.get(media_url('export.bin'))
+
+        self.assertEqual(res['X-Sendfile'],
+                         os.path.join(MEDIA_ROOT, 'export.bin'))
+
+
+class ParseRangeTests(TestCase):
+    """Test parsing Range headers."""
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 50), (0, 50))
+        self.assertEqual(parse_range('bytes=10-', 50), (10, 50))
+        self.assertEqual(parse_range('bytes=-10', 50), (40, 50))
+        self.assertEqual(parse_range('bytes=-100', 50), (0, 50))
+
+    def test_ignored(self):
+        """Test that unsupported ranges send the whole file."""
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1',
+                       'bytes=9-2'):
+            self.assertIsNone(parse_range(header, 50), header)
+
+    def test_not_satisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=50-', 50)
@@ -0,0 +1,154 @@
+import re
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import Registry, registry
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def sample(text, name, **labels):
+    """Return the value of a sample of an exposition, 0 if missing."""
+    for line in text.splitlines():
+        match = re.match(r'(\w+)(?:\{(.*)\})? (\S+)$', line)
+        if match and match.group(1) == name and \
+                dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or '')) \
+                == labels:
+            return float(match.group(3))
+    return 0
+
+
+class RegistryTests(SimpleTestCase):
+    """Test collecting and exporting metrics."""
+
+    def test_histogram(self):
+        """Test that histograms export cumulative buckets."""
+        metrics = Registry()
+        histogram = metrics.histogram('latency', 'Latency.', ('view',),
+                                      buckets=(1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value, view='a')
+
+        text = metrics.exposition()
+
+        self.assertIn('# TYPE latency histogram', text)
+        self.assertEqual(sample(text, 'latency_bucket', view='a', le='1'), 2)
+        self.assertEqual(sample(text, 'latency_bucket', view='a', le='5'), 3)
+        self.assertEqual(
+            sample(text, 'latency_bucket', view='a', le='+Inf'), 4)
+        self.assertEqual(sample(text, 'latency_count', view='a'), 4)
+        self.assertEqual(sample(text, 'latency_sum', view='a'), 14.5)
+
+    def test_label_escaping(self):
+        """Test that label values are escaped."""
+        metrics = Registry()
+        metrics.counter('events', 'Events.', ('name',)).inc(name='a"b\\')
+
+        self.assertIn(r'events{name="a\"b\\"} 1', metrics.exposition())
+
+    def test_wrong_labels(self):
+        """Test that samples must set exactly the declared labels."""
+        counter = Registry().counter('events', 'Events.', ('name',))
+
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_collector(self):
+        """Test exporting counts kept by other objects."""
+        metrics = Registry()
+        metrics.collector('hits_total', 'Hits.', ('result',))(
+            lambda: {('hit',): 3, ('miss',): 1})
+
+        text = metrics.exposition()
+
+        self.assertEqual(sample(text, 'hits_total', result='hit'), 3)
+        self.assertEqual(sample(text, 'hits_total', result='miss'), 1)
+
+    def test_multiprocess(self):
+        """Test that the metrics of every process file are summed."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        worker, scraper = Registry(directory), Registry(directory)
+        for metrics in (worker, scraper):
+            metrics.counter('events', 'Events.').inc(2)
+        # Both registries live in this process, so they'd share a file
+        worker._path = lambda: f'{directory}/metrics-worker.json'
+        worker.flush()
+
+        self.assertEqual(sample(scraper.exposition(), 'events'), 4)
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the metrics endpoint and the recorded requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_metrics(self):
+        """Test that requests are recorded by viewset action."""
+        labels = {'view': 'RecipeViewSet.list', 'method': 'GET',
+                  'status': '200'}
+        created = {'view': 'RecipeViewSet.create', 'method': 'POST',
+                   'status': '400'}
+        before = sample(registry.exposition(),
+                        'http_request_duration_seconds_count', **labels)
+        before_created = sample(registry.exposition(),
+                                'http_request_duration_seconds_count',
+                                **created)
+
+        self.client.get(RECIPES_URL)
+        self.client.post(RECIPES_URL, {})
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        text = res.content.decode()
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count',
+                                **labels), before + 1)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count',
+                                **created), before_created + 1)
+        self.assertGreater(sample(text, 'http_request_db_queries_count',
+                                  view=labels['view']), 0)
+        self.assertGreater(sample(text, 'http_response_size_bytes_sum',
+                                  view=labels['view']), 0)
+        self.assertIn('auth_token_cache_requests_total', text)
+        self.assertIn('recipe_list_cache_requests_total', text)
+        self.assertIn('# TYPE recipe_image_upload_bytes histogram', text)
+        # Scrapes themselves aren't recorded
+        self.assertNotIn('view="metrics"', text)
+
+    def test_unknown_method_label(self):
+        """Test that unknown methods share a single label."""
+        labels = {'view': 'RecipeViewSet', 'method': 'other',
+                  'status': '405'}
+        before = sample(registry.exposition(),
+                        'http_request_duration_seconds_count', **labels)
+
+        self.client.generic('PROPFIND', RECIPES_URL)
+        self.client.generic('BREW', RECIPES_URL)
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count',
+                                **labels), before + 2)
+        self.assertNotIn('method="BREW"', text)
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_token_required(self):
+        """Test that scrapes must send the token when one is set."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
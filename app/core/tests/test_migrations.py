@@ -0,0 +1,57 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrate to migrate_from, then to migrate_to in the test."""
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        self.apps = executor.loader.project_state(
+            [self.migrate_from]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([self.migrate_to])
+        return executor.loader.project_state([self.migrate_to]).apps
+
+
+class RecipeStatsBackfillTests(MigrationTestCase):
+    """Test that the recipe summaries include existing recipes."""
+    migrate_from = ('core', '0009_recipe_m2m_reverse_indexes')
+    migrate_to = ('core', '0010_recipe_stats')
+
+    def test_existing_recipes_summarized(self):
+        """Test summarizing the recipes stored before the migration."""
+        user = self.apps.get_model('core', 'User').objects.create(
+            email='test@londonappdev.com', password='testpass')
+        tag = self.apps.get_model('core', 'Tag').objects.create(
+            user=user, name='Vegan')
+        Recipe = self.apps.get_model('core', 'Recipe')
+        recipe = Recipe.objects.create(user=user, title='Curry',
+                                       time_minutes=20, price='7.50')
+        recipe.tags.add(tag)
+        Recipe.objects.create(user=user, title='Soup', time_minutes=90,
+                              price='2.50')
+
+        apps = self.migrate()
+
+        stats = {row.tag_id: row for row in
+                 apps.get_model('core', 'RecipeStats').objects.all()}
+        self.assertEqual(set(stats), {None, tag.id})
+        self.assertEqual(stats[None].recipe_count, 2)
+        self.assertEqual(stats[None].price_total, 10)
+        self.assertEqual(stats[None].time_total, 110)
+        self.assertEqual(stats[None].time_buckets, [0, 1, 0, 1, 0])
+        self.assertEqual(stats[tag.id].recipe_count, 1)
+        self.assertEqual(stats[tag.id].time_buckets, [0, 1, 0, 0, 0])
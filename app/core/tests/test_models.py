@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from core import models
 from unittest.mock import patch
@@ -80,3 +83,63 @@ class ModelTests(TestCase):
 
         expected_path = f'uploads/recipe/{uuid}.jpg'
         self.assertEqual(file_path, expected_path)
+
+    def test_recipe_related_ids_maintained(self):
+        """Test the denormalized tag and ingredient ids follow the m2m."""
+        user = sample_user()
+        tag_1 = models.Tag.objects.create(user=user, name='Vegan')
+        tag_2 = models.Tag.objects.create(user=user, name='Dessert')
+        ingredient = models.Ingredient.objects.create(user=user, name='Salt')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Brownies', time_minutes=5, price=5.00)
+
+        recipe.tags.add(tag_2, tag_1)
+        recipe.ingredients.add(ingredient)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, sorted([tag_1.id, tag_2.id]))
+        self.assertEqual(recipe.ingredient_ids, [ingredient.id])
+
+        recipe.tags.remove(tag_1)
+        ingredient.recipe_set.clear()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [tag_2.id])
+        self.assertEqual(recipe.ingredient_ids, [])
+
+        tag_2.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [])
+
+    def test_recipe_save_keeps_related_ids(self):
+        """Test saving a stale recipe instance keeps its derived fields."""
+        user = sample_user()
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Brownies', time_minutes=5, price=5.00)
+        recipe.tags.add(tag)
+
+        # The instance still holds the ids from before the tag was added
+        recipe.title = 'Vegan brownies'
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Vegan brownies')
+        self.assertEqual(recipe.tag_ids, [tag.id])
+
+    def test_recipe_updated_at_single_clock(self):
+        """Test saves and derived field updates stamp the database clock."""
+        user = sample_user()
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Brownies', time_minutes=5, price=5.00)
+
+        # An application server clock ahead of the database's
+        ahead = timezone.now() + timedelta(days=1)
+        with patch('django.utils.timezone.now', return_value=ahead):
+            recipe.title = 'Vegan brownies'
+            recipe.save()
+        saved_at = recipe.updated_at
+        self.assertLess(saved_at, ahead)
+
+        recipe.tags.add(tag)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, saved_at)
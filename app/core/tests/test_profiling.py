@@ -0,0 +1,106 @@
+import marshal
+import re
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.profiling import profiles
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PROFILES_URL = reverse('profile-list')
+
+PROFILING = {'HEADER': 'X-Profile', 'TOKEN': 'secret', 'MAX_PROFILES': 50}
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics of a response by name."""
+    return {name: params for name, params in
+            re.findall(r'(\w+);([^,]*)', response['Server-Timing'])}
+
+
+def profile_url(profile_id):
+    return reverse('profile-detail', args=[profile_id])
+
+
+@override_settings(PROFILING=PROFILING)
+class ProfilingTests(TestCase):
+    """Test the request timings and on demand profiles."""
+
+    def setUp(self):
+        profiles.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(user=self.user, title='Soup',
+                              time_minutes=5, price='2.00')
+
+    def test_server_timing(self):
+        """Test that responses report their query count and timings."""
+        res = self.client.get(RECIPES_URL)
+
+        timing = server_timing(res)
+        self.assertEqual(set(timing), {'db', 'app', 'serialize', 'total'})
+        self.assertRegex(timing['db'], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertNotIn('X-Profile-Id', res)
+
+    def test_profile_requires_token(self):
+        """Test that only requests with the token are profiled."""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='wrong')
+
+        self.assertNotIn('X-Profile-Id', res)
+        with override_settings(PROFILING={'TOKEN': None}):
+            res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='')
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertFalse(profiles.list())
+
+    def test_profile_request(self):
+        """Test profiling a request and reading it back as staff."""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='secret')
+        profile_id = int(res['X-Profile-Id'])
+
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(PROFILES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['id'], profile_id)
+        self.assertEqual(res.data[0]['path'], RECIPES_URL)
+        self.assertNotIn('stats', res.data[0])
+
+        res = self.client.get(profile_url(profile_id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'function calls', res.content)
+
+        res = self.client.get(profile_url(profile_id), {'download': 1})
+        self.assertIsInstance(marshal.loads(res.content), dict)
+
+    def test_profiles_staff_only(self):
+        """Test that profiles are hidden from regular users."""
+        res = self.client.get(PROFILES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_profile(self):
+        """Test that unknown or evicted profiles are not found."""
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(profile_url(1))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch.object(profiles, 'max_size', 2)
+    def test_ring_buffer_bounded(self):
+        """Test that the oldest profiles are dropped."""
+        ids = [int(self.client.get(RECIPES_URL, HTTP_X_PROFILE='secret')
+                   ['X-Profile-Id']) for _ in range(3)]
+
+        self.assertEqual([entry['id'] for entry in profiles.list()],
+                         ids[:0:-1])
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile, \
+    TemporaryUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def ref_counts():
+    return dict(ImageBlob.objects.values_list('name', 'ref_count'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    """Test storing files under the hash of their content."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_named_by_content(self):
+        """Test that the name is the digest, keeping the extension."""
+        digest = hashlib.sha256(b'photo').hexdigest()
+
+        name = image_storage.save('uploads/recipe/x.JPG',
+                                  ContentFile(b'photo'))
+
+        self.assertEqual(name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        with image_storage.open(name) as file:
+            self.assertEqual(file.read(), b'photo')
+
+    def test_same_content_written_once(self):
+        """Test that saving stored content returns the existing file."""
+        first = image_storage.save('uploads/recipe/a.png',
+                                   ContentFile(b'pixels'))
+        inode = os.stat(image_storage.path(first)).st_ino
+
+        second = image_storage.save('uploads/recipe/b.png',
+                                    SimpleUploadedFile('b.png', b'pixels'))
+
+        self.assertEqual(first, second)
+        # The file wasn't replaced
+        self.assertEqual(os.stat(image_storage.path(first)).st_ino, inode)
+        self.assertEqual(os.listdir(os.path.dirname(
+            image_storage.path(first))), [os.path.basename(first)])
+
+    def test_temporary_upload_moved(self):
+        """Test that uploads spooled to disk are moved, not copied."""
+        upload = TemporaryUploadedFile('big.png', 'image/png', 5, None)
+        upload.write(b'large')
+        upload.flush()
+
+        name = image_storage.save('uploads/recipe/big.png', upload)
+
+        self.assertFalse(os.path.exists(upload.temporary_file_path()))
+        with image_storage.open(name) as file:
+            self.assertEqual(file.read(), b'large')
+        upload.close()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageBlobTests(TestCase):
+    """Test counting the recipes referencing each stored image."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+
+    def create_recipe(self, content=None):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5, price='1.00')
+        if content is not None:
+            recipe.image.save('photo.jpg', ContentFile(content))
+        return recipe
+
+    def test_shared_image_counted(self):
+        """Test that recipes with the same image share one blob."""
+        first = self.create_recipe(b'photo')
+        second = self.create_recipe(b'photo')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(ref_counts(), {first.image.name: 2})
+
+    def test_replaced_and_cleared_images(self):
+        """Test that changing the image moves the reference."""
+        recipe = self.create_recipe(b'old')
+        old_name = recipe.image.name
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image.save('photo.jpg', ContentFile(b'new'))
+        self.assertEqual(ref_counts(), {old_name: 0, recipe.image.name: 1})
+
+        recipe.image = None
+        recipe.save()
+        self.assertEqual(set(ref_counts().values()), {0})
+
+    def test_other_saves_not_counted(self):
+        """Test that saving other fields leaves the counts alone."""
+        recipe = self.create_recipe(b'photo')
+        recipe = Recipe.objects.get(pk=recipe.pk)
+
+        recipe.title = 'Renamed'
+        recipe.save()
+        recipe.save(update_fields=['title'])
+
+        Recipe(pk=recipe.pk, user=self.user, title='Unloaded',
+               time_minutes=5, price='1.00', image=recipe.image.name).save()
+        self.assertEqual(ref_counts(), {recipe.image.name: 1})
+
+    def test_deleted_recipes(self):
+        """Test that deleting recipes, and their users, drops references."""
+        name = self.create_recipe(b'photo').image.name
+        self.create_recipe(b'photo').delete()
+        self.assertEqual(ref_counts(), {name: 1})
+
+        # Cascading, purges maintain the counts themselves
+        get_user_model().objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(ref_counts(), {name: 0})
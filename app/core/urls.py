@@ -0,0 +1,11 @@
+from django.urls import path
+
+from core import views
+
+
+app_name = 'health'
+
+urlpatterns = [
+    path('live/', views.liveness, name='live'),
+    path('ready/', views.readiness, name='ready'),
+]
@@ -0,0 +1,120 @@
+import hmac
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.db.utils import OperationalError
+from django.http import Http404, HttpResponse, HttpResponseForbidden, \
+    JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET, require_safe
+
+from rest_framework import permissions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import media as media_files
+from core.health import ping
+from core.metrics import registry
+from core.profiling import profiles
+from user.authentication import CachedTokenAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+
+@never_cache
+@require_GET
+def liveness(request):
+    """Report that the process serves requests, without touching the db."""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_GET
+def readiness(request):
+    """Report whether every database answers, with its latency."""
+    databases = {}
+    for alias in connections:
+        try:
+            latency = ping(alias)
+        except OperationalError:
+            # The error names hosts, databases and users, only log it
+            logger.warning('Database %s is unavailable', alias,
+                           exc_info=True)
+            # Closed so the next check, or request, reconnects
+            connections[alias].close()
+            databases[alias] = {'status': 'unavailable'}
+        else:
+            databases[alias] = {'status': 'ok',
+                                'latency_ms': round(latency * 1000, 3)}
+
+    ready = all(db['status'] == 'ok' for db in databases.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'databases': databases},
+        status=200 if ready else 503)
+
+
+@never_cache
+@require_GET
+def metrics(request):
+    """Export the metrics of every worker in the Prometheus text format."""
+    token = getattr(settings, 'METRICS', {}).get('TOKEN')
+    if token and not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(),
+                        content_type='text/plain; version=0.0.4')
+
+
+# Scrapes aren't recorded in the metrics they read
+metrics.skip_metrics = True
+
+
+@require_safe
+def media(request, path):
+    """Serve an uploaded file, see MEDIA_SERVING in the settings."""
+    return media_files.serve(request, path)
+
+
+class ProfileViewMixin:
+    """Restrict the profiles to staff, from the API or the admin site."""
+    authentication_classes = (CachedTokenAuthentication,
+                              SessionAuthentication)
+    permission_classes = (permissions.IsAdminUser,)
+
+
+class ProfileListView(ProfileViewMixin, APIView):
+    """List the profiles captured by this process, newest first."""
+
+    def get(self, request):
+        return Response([
+            {key: value for key, value in entry.items() if key != 'stats'}
+            for entry in profiles.list()
+        ])
+
+
+class ProfileDetailView(ProfileViewMixin, APIView):
+    """Return the pstats report of a profile, or its dump file."""
+
+    def get(self, request, profile_id):
+        entry = profiles.get(profile_id)
+        if entry is None:
+            raise Http404
+
+        # ?download=1 returns a file for pstats, snakeviz and friends
+        if request.query_params.get('download'):
+            response = HttpResponse(entry['stats'],
+                                    content_type='application/octet-stream')
+            response['Content-Disposition'] = \
+                f'attachment; filename="profile-{profile_id}.prof"'
+            return response
+
+        sort = request.query_params.get('sort', 'cumulative')
+        try:
+            report = profiles.report(entry, sort)
+        except KeyError:
+            return Response({'sort': 'Unknown sort key.'}, status=400)
+        return HttpResponse(report, content_type='text/plain')
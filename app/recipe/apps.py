@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        # Connect the list cache invalidation handlers
+        from recipe import signals  # noqa: F401
+        # Register the collectors of the caches in the metrics
+        from recipe import metrics  # noqa: F401
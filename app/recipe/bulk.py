@@ -0,0 +1,206 @@
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+from django.utils.translation import gettext as _
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from recipe import serializers
+from recipe.cache import list_cache
+
+
+# Fields of RecipeBulkItemSerializer stored on the recipe row itself
+SCALAR_FIELDS = ('title', 'time_minutes', 'price', 'link')
+# Related fields, with their column in the m2m through table
+RELATED_FIELDS = {'tags': 'tag_id', 'ingredients': 'ingredient_id'}
+
+
+class BulkRecipeWriter:
+    """Create and update many recipes of a user with set-based queries.
+
+    Items are validated first, without touching the database, then all
+    referenced tags and ingredients are checked in one query, and the
+    rows are written with bulk inserts and CASE updates in a single
+    transaction. Results are reported per item, in the input order.
+    """
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+        self.results = [None] * len(items)
+        self._validated = []
+
+    @property
+    def valid(self):
+        """Return (index, validated data) of the items without errors."""
+        return [(index, data) for index, data in self._validated
+                if self.results[index] is None]
+
+    @property
+    def has_errors(self):
+        return any(result is not None for result in self.results)
+
+    def validate(self):
+        """Validate every item, returning whether they are all valid."""
+        for index, item in enumerate(self.items):
+            partial = isinstance(item, dict) and 'id' in item
+            serializer = serializers.RecipeBulkItemSerializer(
+                data=item, partial=partial)
+            if serializer.is_valid():
+                self._validated.append((index, serializer.validated_data))
+            else:
+                self._fail(index, serializer.errors)
+
+        self._check_duplicate_ids()
+        self._check_related_ids()
+        self._check_recipe_ids()
+
+        return not self.has_errors
+
+    def save(self):
+        """Write the valid items and return the per item results."""
+        creates = [(index, data) for index, data in self.valid
+                   if 'id' not in data]
+        updates = [(index, data) for index, data in self.valid
+                   if 'id' in data]
+
+        with transaction.atomic():
+            # Summaries are updated by difference, like the signals do
+            RecipeStats.objects.record(
+                [data['id'] for index, data in updates], -1)
+            created = Recipe.objects.bulk_create([
+                Recipe(user=self.user, **self._scalars(data))
+                for index, data in creates
+            ])
+            for (index, data), recipe in zip(creates, created):
+                data['id'] = recipe.pk
+            self._update(updates)
+            linked = self._set_related(creates, updates)
+
+            recipe_ids = [data['id'] for index, data in self.valid]
+            # Bulk writes don't send the signals maintaining these
+            Recipe.objects.filter(pk__in=recipe_ids).refresh_related()
+            RecipeStats.objects.record(recipe_ids)
+            for field, ids in linked.items():
+                if ids:
+                    Recipe._meta.get_field(field).related_model.objects \
+                        .filter(pk__in=ids).refresh_usage()
+            list_cache.invalidate(self.user.pk)
+
+        recipes = Recipe.objects.filter(pk__in=recipe_ids) \
+            .with_related_ids().in_bulk()
+        for status, items in (('created', creates), ('updated', updates)):
+            for index, data in items:
+                self.results[index] = {
+                    'status': status,
+                    'data': serializers.RecipeSerializer(
+                        recipes[data['id']]).data,
+                }
+
+        return self.results
+
+    def _fail(self, index, errors):
+        self.results[index] = {'status': 'invalid', 'errors': errors}
+
+    def _check_duplicate_ids(self):
+        """Reject items updating a recipe already updated by the batch."""
+        seen = set()
+        for index, data in self.valid:
+            if 'id' not in data:
+                continue
+            if data['id'] in seen:
+                self._fail(index, {'id': [_('Duplicate recipe in batch.')]})
+            seen.add(data['id'])
+
+    def _check_related_ids(self):
+        """Check all referenced tags and ingredients in a single query."""
+        wanted = {field: set() for field in RELATED_FIELDS}
+        for index, data in self.valid:
+            for field in RELATED_FIELDS:
+                wanted[field].update(data.get(field, ()))
+        if not any(wanted.values()):
+            return
+
+        tags = Tag.objects \
+            .filter(user=self.user, id__in=wanted['tags']) \
+            .annotate(kind=Value('tags', CharField())) \
+            .values_list('id', 'kind')
+        ingredients = Ingredient.objects \
+            .filter(user=self.user, id__in=wanted['ingredients']) \
+            .annotate(kind=Value('ingredients', CharField())) \
+            .values_list('id', 'kind')
+        known = set(tags.union(ingredients, all=True))
+
+        for index, data in self.valid:
+            errors = {}
+            for field in RELATED_FIELDS:
+                missing = [pk for pk in data.get(field, ())
+                           if (pk, field) not in known]
+                if missing:
+                    errors[field] = [
+                        _('Invalid pk "{pk_value}" - object does not exist.')
+                        .format(pk_value=pk) for pk in missing
+                    ]
+            if errors:
+                self._fail(index, errors)
+
+    def _check_recipe_ids(self):
+        """Check the updated recipes exist and belong to the user."""
+        ids = [data['id'] for index, data in self.valid if 'id' in data]
+        if not ids:
+            return
+
+        existing = set(Recipe.objects.filter(user=self.user, id__in=ids)
+                       .values_list('id', flat=True))
+        for index, data in self.valid:
+            if 'id' in data and data['id'] not in existing:
+                self._fail(index, {'id': [_('Not found.')]})
+
+    @staticmethod
+    def _scalars(data):
+        return {field: data[field] for field in SCALAR_FIELDS
+                if field in data}
+
+    def _update(self, updates):
+        """Update the scalar fields with one CASE expression per field."""
+        values = {}
+        for index, data in updates:
+            for field, value in self._scalars(data).items():
+                values.setdefault(field, []).append((data['id'], value))
+        if not values:
+            return
+
+        columns = {}
+        for field, pairs in values.items():
+            model_field = Recipe._meta.get_field(field)
+            columns[field] = Case(
+                *[When(pk=pk, then=Value(value, output_field=model_field))
+                  for pk, value in pairs],
+                default=F(field),
+                output_field=model_field,
+            )
+
+        ids = [data['id'] for index, data in updates]
+        Recipe.objects.filter(pk__in=ids).update(**columns)
+
+    def _set_related(self, creates, updates):
+        """Replace the tags and ingredients given for each recipe.
+
+        Return the ids of the tags and ingredients linked or unlinked.
+        """
+        linked = {}
+        for field, column in RELATED_FIELDS.items():
+            through = getattr(Recipe, field).through
+            items = [data for index, data in creates + updates
+                     if field in data]
+
+            linked[field] = {pk for data in items for pk in data[field]}
+            replaced = [data['id'] for index, data in updates if field in data]
+            if replaced:
+                links = through.objects.filter(recipe_id__in=replaced)
+                linked[field].update(links.values_list(column, flat=True))
+                links.delete()
+
+            through.objects.bulk_create([
+                through(recipe_id=data['id'], **{column: pk})
+                for data in items for pk in dict.fromkeys(data[field])
+            ])
+        return linked
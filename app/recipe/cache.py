@@ -0,0 +1,97 @@
+import hashlib
+import threading
+
+from django.conf import settings
+
+from core.cache import get_cache_backend
+from core.models import RecipeVersion
+
+
+# Query params holding comma separated ids, normalized so that the
+# same filter spelled differently shares one cache entry
+ID_LIST_PARAMS = ('tags', 'ingredients')
+
+
+class ListResponseCache:
+    """Cache of serialized recipe list responses per user.
+
+    Entries are keyed on the user, the normalized query params and the
+    user's current version. Bumping the version, which the handlers in
+    recipe.signals do on every write, makes all the user's entries
+    unreachable at once; they are then evicted by the bounded backend.
+    Versions are kept in the database, so a write invalidates the entries
+    of every process, even when each has its own backend.
+    """
+
+    def __init__(self, max_size=1000, ttl=60, cache_alias=None):
+        self.ttl = ttl
+        self.backend = get_cache_backend(max_size, ttl, cache_alias)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Create a cache configured by settings.RECIPE_LIST_CACHE."""
+        return cls(**{key.lower(): value for key, value in
+                      getattr(settings, 'RECIPE_LIST_CACHE', {}).items()})
+
+    def version(self, user_id):
+        """Return the version of the user's responses and when it changed."""
+        return RecipeVersion.objects.current(user_id)
+
+    def invalidate(self, user_id):
+        """Make every cached response of the user stale once committed."""
+        RecipeVersion.objects.bump(user_id)
+
+    @staticmethod
+    def normalize(query_params):
+        """Return a canonical string of the query params."""
+        items = []
+        for name in sorted(query_params):
+            value = ','.join(query_params.getlist(name))
+            if name in ID_LIST_PARAMS:
+                try:
+                    value = ','.join(
+                        str(pk) for pk in
+                        sorted({int(pk) for pk in value.split(',')}))
+                except ValueError:
+                    pass
+            items.append(f'{name}={value}')
+        return '&'.join(items)
+
+    def key(self, user_id, query_params, version=None):
+        """Return the cache key of a list request.
+
+        The version must be read before querying the database, so
+        responses computed while a write happens are cached under the
+        old version.
+        """
+        if version is None:
+            version, _ = self.version(user_id)
+        params = hashlib.sha1(
+            self.normalize(query_params).encode()).hexdigest()
+        return f'recipe-list:{user_id}:{version}:{params}'
+
+    def get(self, key):
+        """Return the cached (data, headers) for key, or None."""
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, data, headers):
+        """Cache the serialized data and headers of a response."""
+        self.backend.set(key, (data, headers), self.ttl)
+
+    def clear(self):
+        """Forget every cached response and reset the counters."""
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+list_cache = ListResponseCache.from_settings()
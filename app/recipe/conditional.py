@@ -0,0 +1,45 @@
+import calendar
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Return a strong ETag identifying a representation by parts."""
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+
+def _timestamp(last_modified):
+    if last_modified is None:
+        return None
+    return calendar.timegm(last_modified.utctimetuple())
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add the ETag and Last-Modified headers to response."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return the response answering the request's preconditions, or None.
+
+    That is a 304 Not Modified when If-None-Match matches etag, or
+    without If-None-Match when nothing changed since If-Modified-Since;
+    and a 412 when If-Match or If-Unmodified-Since fail.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def has_preconditions(request):
+    """Return whether request sends conditional headers."""
+    return any(header in request.META for header in (
+        'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH',
+        'HTTP_IF_UNMODIFIED_SINCE'))
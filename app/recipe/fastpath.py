@@ -0,0 +1,165 @@
+import functools
+from collections import OrderedDict
+
+from django.conf import settings
+
+from rest_framework import serializers as drf_serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from recipe.serializers import RenditionsField, rendition_urls
+
+
+class CannotCompile(Exception):
+    """The serializer has fields the row mapper can't reproduce."""
+
+
+class RowMapper:
+    """Build the output of a read only serializer from values() rows.
+
+    The fields of the serializer are inspected once, each one is turned
+    into a converter reading its column(s) from a row dict, so mapping a
+    row costs one function call per field instead of DRF's generic
+    attribute lookup and to_representation machinery. The output is
+    identical to the serializer's; fields that can't be reproduced
+    exactly raise CannotCompile. With fields, only those are mapped and
+    only their columns read.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.columns = []
+        self.converters = [
+            (name, self._compile(field))
+            for name, field in serializer.fields.items()
+            if not field.write_only and (fields is None or name in fields)
+        ]
+
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def _compile(self, field):
+        """Return a function computing the field from a row."""
+        if isinstance(field, RenditionsField):
+            image = self._column('image')
+            renditions = self._column('image_renditions')
+            return lambda row, request: rendition_urls(
+                row[image], row[renditions], request)
+
+        if '.' in field.source or field.source == '*':
+            raise CannotCompile(field)
+
+        if isinstance(field, drf_serializers.ManyRelatedField):
+            if not isinstance(field.child_relation,
+                              drf_serializers.PrimaryKeyRelatedField):
+                raise CannotCompile(field)
+            # Denormalized ids, sorted like the prefetched relations
+            try:
+                column = self._column(
+                    self.model.related_id_fields[field.source])
+            except (AttributeError, KeyError):
+                raise CannotCompile(field)
+            return lambda row, request: row[column]
+
+        column = self._column(field.source)
+
+        if isinstance(field, drf_serializers.DecimalField):
+            return self._compile_decimal(field, column)
+
+        # Database values already have the type these fields output
+        if type(field) in (drf_serializers.CharField,
+                           drf_serializers.IntegerField,
+                           drf_serializers.BooleanField,
+                           drf_serializers.ReadOnlyField):
+            return lambda row, request: row[column]
+
+        raise CannotCompile(field)
+
+    def _compile_decimal(self, field, column):
+        model_field = self.model._meta.get_field(field.source)
+        coerce_to_string = getattr(field, 'coerce_to_string',
+                                   api_settings.COERCE_DECIMAL_TO_STRING)
+        # The database returns values at the model field's scale, so
+        # quantizing them is a no-op unless the scales differ
+        if model_field.decimal_places != field.decimal_places or \
+                not coerce_to_string or field.localize:
+            def convert(row, request):
+                value = row[column]
+                return None if value is None else \
+                    field.to_representation(value)
+            return convert
+
+        def format_decimal(row, request):
+            value = row[column]
+            return None if value is None else '{:f}'.format(value)
+        return format_decimal
+
+    def prepare(self, queryset, extra_columns=()):
+        """Return queryset fetching the rows needed to map them."""
+        columns = self.columns + [column for column in extra_columns
+                                  if column not in self.columns]
+        # Relations come from the denormalized columns, not prefetches
+        return queryset.prefetch_related(None).values(*columns)
+
+    def map(self, rows, request=None):
+        """Return the serialized representation of rows."""
+        converters = self.converters
+        return [
+            OrderedDict([(name, convert(row, request))
+                         for name, convert in converters])
+            for row in rows
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_row_mapper(serializer_class, fields=None):
+    """Return the compiled mapper of serializer_class, or None.
+
+    fields, when given, must be hashable.
+    """
+    try:
+        return RowMapper(serializer_class, fields)
+    except CannotCompile:
+        return None
+
+
+class FastListMixin:
+    """List action serializing values() rows with a compiled RowMapper.
+
+    Opt in with settings.FAST_LIST_SERIALIZATION, views fall back to
+    their serializer when it can't be compiled.
+    """
+
+    def get_row_mapper(self):
+        """Return the mapper for this request's list, or None."""
+        if not getattr(settings, 'FAST_LIST_SERIALIZATION', False):
+            return None
+        return get_row_mapper(self.get_serializer_class(),
+                              self.get_serializer_fields())
+
+    def get_serializer_fields(self):
+        """Return the names of the fields to render, None for all."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        mapper = self.get_row_mapper()
+        if mapper is None:
+            return super().list(request, *args, **kwargs)
+
+        # The paginator needs the values of the ordering columns
+        if hasattr(self, 'get_ordering'):
+            ordering = self.get_ordering()
+        else:
+            ordering = getattr(self, 'ordering', ())
+        queryset = mapper.prepare(
+            self.filter_queryset(self.get_queryset()),
+            [field.lstrip('-') for field in ordering])
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(mapper.map(page, request))
+
+        return Response(mapper.map(queryset, request))
@@ -0,0 +1,447 @@
+import http.client
+import io
+import itertools
+import json
+import math
+import platform
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag, Ingredient
+from recipe import renditions
+from recipe.sampledata import seed_recipes
+
+
+PASSWORD = 'benchmark-password'
+ROUTE_HEADER = 'X-Benchmark-Route'
+
+
+def percentile(values, percent):
+    """Return the nearest rank percentile of sorted values."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Request handler that doesn't log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed pool of threads.
+
+    Like the threads of a production worker, each thread keeps its
+    database connection between requests.
+    """
+
+    def __init__(self, threads, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = threads
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        # Every thread closes its own connections, the barrier makes
+        # sure each thread runs exactly one of these jobs
+        barrier = threading.Barrier(self.threads)
+
+        def close_connections():
+            connections.close_all()
+            barrier.wait(timeout=5)
+
+        for _ in range(self.threads):
+            self.pool.submit(close_connections)
+        self.pool.shutdown()
+        super().server_close()
+
+
+class QueryCounter:
+    """WSGI middleware counting the queries of each benchmarked route.
+
+    Counts run until the response is closed, so the queries of
+    streamed responses are included.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.counts = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        route = environ.get('HTTP_' + ROUTE_HEADER.upper().replace('-', '_'))
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with self._lock:
+            self.in_flight += 1
+        stack = ExitStack()
+        stack.enter_context(connection.execute_wrapper(count))
+
+        @stack.callback
+        def record():
+            with self._lock:
+                self.in_flight -= 1
+                requests, total = self.counts.get(route, (0, 0))
+                self.counts[route] = (requests + 1, total + queries)
+
+        try:
+            response = self.application(environ, start_response)
+        except BaseException:
+            stack.close()
+            raise
+        return ClosingResponse(response, stack.close)
+
+    def wait_idle(self, timeout=10):
+        """Wait until every response served so far is closed."""
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def pop(self, route):
+        """Return the mean queries per request of route, and forget it."""
+        with self._lock:
+            requests, total = self.counts.pop(route, (0, 0))
+        return total / requests if requests else None
+
+
+class ClosingResponse:
+    """WSGI response iterable calling on_close after the response."""
+
+    def __init__(self, response, on_close):
+        self.response = response
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def close(self):
+        try:
+            if hasattr(self.response, 'close'):
+                self.response.close()
+        finally:
+            self.on_close()
+
+
+def _png():
+    """Return the bytes of a small PNG image."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), (200, 120, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _multipart(field, filename, content):
+    """Return the body and content type of a one file form."""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; '
+            f'name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + content + \
+        f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Command(BaseCommand):
+    """Django command measuring the latency of every API endpoint"""
+    help = ('Serve the API on a local threaded server, drive every user '
+            'and recipe route with concurrent clients and report latency '
+            'percentiles, throughput and queries per request. Benchmark '
+            'data is created in the database and removed afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Recipes of the benchmark user.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags of the benchmark user.')
+        parser.add_argument('--ingredients', type=int, default=50,
+                            help='Ingredients of the benchmark user.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per route.')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Unmeasured requests per route first.')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent clients, and server threads.')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only benchmark this route, repeatable.')
+        parser.add_argument('--output',
+                            help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        """Seed data, benchmark each route, report and clean up"""
+        routes = self._routes()
+        names = options['routes'] or list(routes)
+        unknown = set(names) - set(routes)
+        if unknown:
+            raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}'
+                               f', choose from {", ".join(routes)}')
+
+        self.run_id = uuid.uuid4().hex[:12]
+        media_root = tempfile.mkdtemp()
+        # Login throttles would reject most of the benchmark's requests,
+        # uploads go to a directory removed afterwards
+        with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1'],
+                LOGIN_THROTTLES={'RATES': {}}, MEDIA_ROOT=media_root):
+            try:
+                self._seed(options)
+                results = self._run(routes, names, options)
+            finally:
+                self._cleanup()
+                shutil.rmtree(media_root, ignore_errors=True)
+
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'run_id': self.run_id,
+                    'started': self.started,
+                    'python': platform.python_version(),
+                    'dataset': {key: options[key] for key in
+                                ('recipes', 'tags', 'ingredients')},
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'routes': results,
+                }, output, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def _email(self, name):
+        return f'benchmark-{self.run_id}-{name}@example.com'
+
+    def _seed(self, options):
+        """Create the benchmark user and its data."""
+        self.user = get_user_model().objects.create_user(
+            self._email('user'), PASSWORD, name='Benchmark')
+        self.token = Token.objects.create(user=self.user).key
+        self.recipe_ids = [recipe.pk for recipe in seed_recipes(
+            self.user, options['recipes'], options['tags'],
+            options['ingredients'])]
+        self.tag_ids = list(Tag.objects.filter(user=self.user)
+                            .values_list('id', flat=True))
+        self.ingredient_ids = list(Ingredient.objects.filter(user=self.user)
+                                   .values_list('id', flat=True))
+        # Recipes created by the benchmark, deleted by recipe-delete
+        self.created_ids = []
+        self.image = _png()
+
+    def _cleanup(self):
+        """Remove every user, and so all data, the benchmark created."""
+        get_user_model().objects.filter(
+            email__startswith=f'benchmark-{self.run_id}-').delete()
+
+    def _routes(self):
+        """Return the benchmarked requests, by route name.
+
+        Each one is a function of the request's sequence number,
+        returning its method, path and optional JSON body.
+        """
+        def pick(ids, i):
+            return ids[i % len(ids)]
+
+        def recipe(i):
+            return {'title': f'Benchmark {i}', 'time_minutes': 10,
+                    'price': '5.00', 'tags': self.tag_ids[:2],
+                    'ingredients': self.ingredient_ids[:3]}
+
+        def delete(i):
+            try:
+                pk = self.created_ids.pop()
+            except IndexError:
+                # More deletes than creates, counted as errors
+                pk = 0
+            return 'DELETE', f'/api/recipe/recipes/{pk}/', None
+
+        def upload(i):
+            body, content_type = _multipart('image', f'{i}.png', self.image)
+            return 'POST', f'/api/recipe/recipes/' \
+                f'{pick(self.recipe_ids, i)}/upload-image/', \
+                (body, content_type)
+
+        return {
+            'user-create': lambda i: (
+                'POST', '/api/user/create/',
+                {'email': self._email(f'signup-{i}'), 'password': PASSWORD,
+                 'name': 'Signup'}),
+            'user-token': lambda i: (
+                'POST', '/api/user/token/',
+                {'email': self.user.email, 'password': PASSWORD}),
+            'user-me': lambda i: ('GET', '/api/user/me/', None),
+            'user-me-update': lambda i: (
+                'PATCH', '/api/user/me/', {'name': f'Benchmark {i}'}),
+            'api-root': lambda i: ('GET', '/api/recipe/', None),
+            'tag-list': lambda i: ('GET', '/api/recipe/tags/', None),
+            'tag-create': lambda i: (
+                'POST', '/api/recipe/tags/', {'name': f'Benchmark {i}'}),
+            'tag-autocomplete': lambda i: (
+                'GET', f'/api/recipe/tags/autocomplete/?prefix=Tag+{i % 10}',
+                None),
+            'ingredient-list': lambda i: (
+                'GET', '/api/recipe/ingredients/', None),
+            'ingredient-create': lambda i: (
+                'POST', '/api/recipe/ingredients/',
+                {'name': f'Benchmark {i}'}),
+            'ingredient-autocomplete': lambda i: (
+                'GET', '/api/recipe/ingredients/autocomplete/'
+                f'?prefix=Ingredient+{i % 10}', None),
+            'recipe-list': lambda i: ('GET', '/api/recipe/recipes/', None),
+            'recipe-list-filtered': lambda i: (
+                'GET', f'/api/recipe/recipes/?tags={pick(self.tag_ids, i)}'
+                f'&ingredients={pick(self.ingredient_ids, i)}', None),
+            'recipe-search': lambda i: (
+                'GET', f'/api/recipe/recipes/?search=recipe+{i % 10}', None),
+            'recipe-detail': lambda i: (
+                'GET', f'/api/recipe/recipes/{pick(self.recipe_ids, i)}/',
+                None),
+            'recipe-create': lambda i: (
+                'POST', '/api/recipe/recipes/', recipe(i)),
+            'recipe-update': lambda i: (
+                'PATCH', f'/api/recipe/recipes/{pick(self.recipe_ids, i)}/',
+                {'title': f'Updated {i}'}),
+            'recipe-delete': delete,
+            'recipe-upload-image': upload,
+            'recipe-bulk': lambda i: (
+                'POST', '/api/recipe/recipes/bulk/',
+                [recipe(i * 10 + j) for j in range(10)]),
+            'recipe-export': lambda i: (
+                'GET', '/api/recipe/recipes/export/', None),
+            'recipe-stats': lambda i: ('GET', '/api/recipe/stats/', None),
+        }
+
+    def _request(self, port, route, method, path, body):
+        """Send a request, return its status and latency in seconds."""
+        headers = {ROUTE_HEADER: route,
+                   'Authorization': f'Token {self.token}'}
+        if isinstance(body, tuple):
+            body, headers['Content-Type'] = body
+        elif body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        client = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            start = time.perf_counter()
+            client.request(method, path, body, headers)
+            response = client.getresponse()
+            data = response.read()
+            latency = time.perf_counter() - start
+        finally:
+            client.close()
+
+        if route == 'recipe-create' and response.status == 201:
+            self.created_ids.append(json.loads(data)['id'])
+        return response.status, latency
+
+    def _run(self, routes, names, options):
+        """Benchmark the routes in order, return their results."""
+        concurrency = options['concurrency']
+        if settings.RECIPE_IMAGE_RENDITION_WORKERS:
+            # Fork the rendition workers before any connection is open,
+            # forked during a request they'd inherit its socket
+            renditions.get_executor().submit(int).result()
+
+        application = QueryCounter(get_wsgi_application())
+        server = PooledWSGIServer(concurrency, ('127.0.0.1', 0), QuietHandler)
+        server.set_app(application)
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        sequence = itertools.count()
+        results = []
+        try:
+            # Deletes need the recipes created first
+            if 'recipe-delete' in names and 'recipe-create' not in names:
+                names = ['recipe-create'] + names
+            names = sorted(names, key=lambda name: name == 'recipe-delete')
+
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                for name in names:
+                    route = routes[name]
+
+                    def send(_):
+                        method, path, body = route(next(sequence))
+                        return self._request(port, name, method, path, body)
+
+                    list(clients.map(send, range(options['warmup'])))
+                    application.wait_idle()
+                    application.pop(name)
+
+                    start = time.perf_counter()
+                    measured = list(clients.map(send,
+                                                range(options['requests'])))
+                    elapsed = time.perf_counter() - start
+                    application.wait_idle()
+
+                    results.append(self._result(
+                        name, measured, elapsed, application.pop(name)))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        return results
+
+    @staticmethod
+    def _result(name, measured, elapsed, queries):
+        latencies = sorted(latency for status, latency in measured)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            'route': name,
+            'requests': len(measured),
+            'errors': sum(status >= 400 for status, latency in measured),
+            'p50_ms': ms(percentile(latencies, 50)),
+            'p95_ms': ms(percentile(latencies, 95)),
+            'p99_ms': ms(percentile(latencies, 99)),
+            'requests_per_second':
+                round(len(measured) / elapsed, 1) if elapsed else None,
+            'queries_per_request':
+                None if queries is None else round(queries, 2),
+        }
+
+    def _report(self, results):
+        self.stdout.write(
+            f'{"route":<22}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"req/s":>9}{"queries":>9}{"errors":>8}')
+        for result in results:
+            self.stdout.write(
+                f'{result["route"]:<22}{result["p50_ms"]:>9.1f}'
+                f'{result["p95_ms"]:>9.1f}{result["p99_ms"]:>9.1f}'
+                f'{result["requests_per_second"]:>9.1f}'
+                f'{result["queries_per_request"] or 0:>9.1f}'
+                f'{result["errors"]:>8}')
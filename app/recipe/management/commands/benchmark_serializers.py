@@ -0,0 +1,73 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from recipe.fastpath import get_row_mapper
+from recipe.sampledata import seed_recipes
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Django command comparing list serializers with the fast path"""
+    help = ('Time listing recipes with RecipeSerializer and with the '
+            'compiled row mapper, on rows created in a rolled back '
+            'transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of recipes to list.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs of each variant, the best counts.')
+
+    def handle(self, *args, **options):
+        """Seed recipes, time both serializations and roll back"""
+        rows, repeat = options['rows'], options['repeat']
+
+        with transaction.atomic():
+            self._seed(rows)
+            queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+            slow, slow_body = self._time(repeat, lambda: JSONRenderer()
+                                         .render(RecipeSerializer(
+                                             queryset.with_related_ids(),
+                                             many=True).data))
+            mapper = get_row_mapper(RecipeSerializer)
+            fast, fast_body = self._time(repeat, lambda: JSONRenderer()
+                                         .render(mapper.map(
+                                             mapper.prepare(queryset))))
+
+            transaction.set_rollback(True)
+
+        if slow_body != fast_body:
+            raise CommandError('Fast path output differs from serializer')
+
+        self.stdout.write(f'{rows} recipes, best of {repeat} runs '
+                          f'(query, serialization and JSON rendering)')
+        self.stdout.write(f'  RecipeSerializer: {slow * 1000:9.1f} ms')
+        self.stdout.write(f'  RowMapper:        {fast * 1000:9.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {slow / fast:.1f}x, identical output '
+            f'({len(fast_body)} bytes)'))
+
+    def _seed(self, rows):
+        """Create a user with rows recipes, a few tags and ingredients."""
+        self.user = get_user_model().objects.create_user(
+            f'benchmark-{uuid.uuid4().hex}@example.com')
+        seed_recipes(self.user, rows)
+
+    @staticmethod
+    def _time(repeat, func):
+        """Return the best duration of func and its last result"""
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        return best, result
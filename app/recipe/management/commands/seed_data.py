@@ -0,0 +1,202 @@
+import io
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from recipe.sampledata import INGREDIENT_NAMES, TAG_NAMES, \
+    TITLE_ADJECTIVES, TITLE_DISHES, vocabulary
+
+
+# Columns written by COPY, in the order of the generated rows
+COLUMNS = {
+    'core_user': ('id', 'password', 'is_superuser', 'email', 'name',
+                  'is_active', 'is_staff'),
+    'core_tag': ('id', 'user_id', 'name', 'usage'),
+    'core_ingredient': ('id', 'user_id', 'name', 'usage'),
+    'core_recipe': ('id', 'user_id', 'title', 'time_minutes', 'price',
+                    'link', 'image_renditions', 'tag_ids', 'ingredient_ids',
+                    'updated_at'),
+    'core_recipe_tags': ('recipe_id', 'tag_id'),
+    'core_recipe_ingredients': ('recipe_id', 'ingredient_id'),
+}
+
+
+def _array(ids):
+    return '{' + ','.join(map(str, ids)) + '}'
+
+
+def _around(rng, mean):
+    """Return a random count averaging mean, spread by half of it."""
+    return rng.randint(mean - mean // 2, _around_max(mean))
+
+
+def _around_max(mean):
+    return mean + mean // 2
+
+
+class Command(BaseCommand):
+    """Django command loading large amounts of synthetic data"""
+    help = ('Create users with recipes, tags and ingredients at production '
+            'scale. Rows are generated from a seed, so a seed always '
+            'produces the same data, and loaded with COPY in batches of '
+            'users. Every user gets the same password.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Number of users to create.')
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Mean number of recipes per user.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags of each user.')
+        parser.add_argument('--ingredients', type=int, default=60,
+                            help='Ingredients of each user.')
+        parser.add_argument('--recipe-tags', type=int, default=3,
+                            help='Mean number of tags per recipe.')
+        parser.add_argument('--recipe-ingredients', type=int, default=6,
+                            help='Mean number of ingredients per recipe.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random generator.')
+        parser.add_argument('--email-prefix', default='seed',
+                            help='Users are <prefix><n>@example.com.')
+        parser.add_argument('--password', default='password',
+                            help='Password of every created user.')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Users loaded per transaction.')
+        parser.add_argument('--no-search-vector', action='store_false',
+                            dest='search_vector',
+                            help="Don't compute the recipes' search "
+                                 "vectors, which takes most of the time.")
+
+    def handle(self, *args, **options):
+        """Generate and COPY the rows batch by batch"""
+        # Recipes link to up to one and a half times the mean
+        if options['tags'] < _around_max(options['recipe_tags']) or \
+                options['ingredients'] < \
+                _around_max(options['recipe_ingredients']):
+            raise CommandError('Users need more tags and ingredients than '
+                               'the recipes link to.')
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        # Hashing a password takes a good fraction of a second, so it is
+        # hashed once and all users share the hash, salt included
+        self.password = make_password(options['password'])
+        self.tag_names = vocabulary(TAG_NAMES, options['tags'])
+        self.ingredient_names = vocabulary(INGREDIENT_NAMES,
+                                           options['ingredients'])
+        self.counts = dict.fromkeys(COLUMNS, 0)
+        self.now = timezone.now().isoformat()
+
+        start = time.perf_counter()
+        users, batch_size = options['users'], options['batch_size']
+        for first in range(0, users, batch_size):
+            with transaction.atomic():
+                self._load_batch(first, min(batch_size, users - first))
+
+            rows = sum(self.counts.values())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{min(first + batch_size, users)}/{users} users, '
+                f'{rows} rows, {rows / elapsed:,.0f} rows/s')
+
+        elapsed = time.perf_counter() - start
+        for table, count in self.counts.items():
+            self.stdout.write(f'  {table:<25}{count:>12,}')
+        rows = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {rows:,} rows in {elapsed:.1f} s '
+            f'({rows / elapsed:,.0f} rows/s)'))
+
+    def _reserve_ids(self, cursor, table, count):
+        """Return count ids taken from the sequence of table."""
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)", [table, count])
+        return [row[0] for row in cursor.fetchall()]
+
+    def _copy(self, cursor, table, rows):
+        """COPY rows, tuples of column values, into table."""
+        buffer = io.StringIO()
+        # Generated values never contain tabs, newlines or backslashes
+        buffer.writelines('\t'.join(map(str, row)) + '\n' for row in rows)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(COLUMNS[table])}) FROM STDIN', buffer)
+        self.counts[table] += len(rows)
+
+    def _load_batch(self, first, count):
+        """Generate and load count users, starting at number first."""
+        options, rng = self.options, self.rng
+        rows = {table: [] for table in COLUMNS}
+
+        with connection.cursor() as cursor:
+            user_ids = self._reserve_ids(cursor, 'core_user', count)
+            tag_ids = iter(self._reserve_ids(
+                cursor, 'core_tag', count * options['tags']))
+            ingredient_ids = iter(self._reserve_ids(
+                cursor, 'core_ingredient', count * options['ingredients']))
+            recipe_counts = [_around(rng, options['recipes'])
+                             for _ in range(count)]
+            recipe_ids = iter(self._reserve_ids(
+                cursor, 'core_recipe', sum(recipe_counts)))
+
+            for number, user_id, recipes in zip(
+                    range(first, first + count), user_ids, recipe_counts):
+                rows['core_user'].append((
+                    user_id, self.password, 'f',
+                    f'{options["email_prefix"]}{number}@example.com',
+                    f'User {number}', 't', 'f'))
+
+                user_tags = []
+                for name in self.tag_names:
+                    user_tags.append(next(tag_ids))
+                    rows['core_tag'].append(
+                        (user_tags[-1], user_id, name, 0))
+                user_ingredients = []
+                for name in self.ingredient_names:
+                    user_ingredients.append(next(ingredient_ids))
+                    rows['core_ingredient'].append(
+                        (user_ingredients[-1], user_id, name, 0))
+
+                for _ in range(recipes):
+                    self._add_recipe(rows, next(recipe_ids), user_id,
+                                     user_tags, user_ingredients)
+
+            for table in COLUMNS:
+                self._copy(cursor, table, rows[table])
+
+        # COPY doesn't send the signals maintaining these
+        RecipeStats.objects.rebuild(user_ids)
+        Tag.objects.filter(user_id__in=user_ids).refresh_usage()
+        Ingredient.objects.filter(user_id__in=user_ids).refresh_usage()
+
+        if options['search_vector']:
+            Recipe.objects.filter(user_id__in=user_ids) \
+                .refresh_search_vector()
+
+    def _add_recipe(self, rows, recipe_id, user_id, tags, ingredients):
+        options, rng = self.options, self.rng
+        # Sorted like the arrays maintained by refresh_related
+        recipe_tags = sorted(rng.sample(
+            tags, _around(rng, options['recipe_tags'])))
+        recipe_ingredients = sorted(rng.sample(
+            ingredients, _around(rng, options['recipe_ingredients'])))
+
+        rows['core_recipe'].append((
+            recipe_id, user_id,
+            f'{rng.choice(TITLE_ADJECTIVES)} '
+            f'{rng.choice(self.ingredient_names).lower()} '
+            f'{rng.choice(TITLE_DISHES)}',
+            rng.randint(5, 180), f'{rng.randint(100, 9999) / 100:.2f}',
+            '', '{}', _array(recipe_tags), _array(recipe_ingredients),
+            self.now))
+        rows['core_recipe_tags'].extend(
+            (recipe_id, tag_id) for tag_id in recipe_tags)
+        rows['core_recipe_ingredients'].extend(
+            (recipe_id, ingredient_id)
+            for ingredient_id in recipe_ingredients)
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe import sweeper
+
+
+class Command(BaseCommand):
+    """Django command deleting the recipe images no recipe uses"""
+    help = ('Delete the uploaded recipe images and renditions that no '
+            'recipe references anymore, such as replaced images and the '
+            'images of deleted recipes. Meant to run periodically, e.g. '
+            'from cron; files younger than the grace period are kept.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=24 * 60 * 60,
+                            metavar='SECONDS',
+                            help='Keep files modified more recently.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Files deleted per batch.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        """Sweep the orphans batch by batch"""
+        files = reclaimed = 0
+        start = time.perf_counter()
+        for deleted, size in sweeper.sweep(options['grace'],
+                                           options['batch_size'],
+                                           options['dry_run']):
+            files += deleted
+            reclaimed += size
+            self.stdout.write(f'{files} files, {reclaimed} bytes')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {files} orphaned files, reclaiming {reclaimed} bytes, '
+            f'in {time.perf_counter() - start:.1f} s'))
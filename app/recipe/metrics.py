@@ -0,0 +1,13 @@
+from core.metrics import SIZE_BUCKETS, registry
+from recipe.cache import list_cache
+
+
+image_upload_size = registry.histogram(
+    'recipe_image_upload_bytes', 'Size of uploaded recipe images.',
+    buckets=SIZE_BUCKETS)
+
+
+@registry.collector('recipe_list_cache_requests_total',
+                    'Recipe list cache lookups, by result.', ('result',))
+def list_cache_requests():
+    return {('hit',): list_cache.hits, ('miss',): list_cache.misses}
@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination seeking on a unique, indexed ordering.
+
+    Pages are fetched with a `WHERE (ordering) after (cursor)` predicate
+    instead of an OFFSET, and no COUNT(*) is ever run, so every page costs
+    the same index range scan. The response body stays a plain list;
+    links to the neighbouring pages are sent in a `Link` header.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # Must end in a unique field so the position of a row is unambiguous;
+    # views override this with their own `ordering` attribute
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of results seeking from the request's cursor."""
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        position, self.reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset, position)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        # Fetch one extra row to know if there's a page after this one
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        """Return the page as a list, with the page links as a header."""
+        headers = {}
+        links = [
+            f'<{url}>; rel="{rel}"'
+            for url, rel in ((self.get_next_link(), 'next'),
+                             (self.get_previous_link(), 'prev'))
+            if url is not None
+        ]
+        if links:
+            headers['Link'] = ', '.join(links)
+
+        return Response(data, headers=headers)
+
+    def get_ordering(self, view):
+        """Return the ordering declared on the view, if any."""
+        if hasattr(view, 'get_ordering'):
+            return tuple(view.get_ordering())
+        return tuple(getattr(view, 'ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        """Return the requested page size, bounded by max_page_size."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        """Return the url of the next page, or None on the last page."""
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Return the url of the previous page, or None on the first one."""
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Seeked past the end, go back to the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) encoded in the request cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def clean_position(self, queryset, position):
+        """Return the cursor position as values of the ordering fields.
+
+        Cursors come from clients, values that aren't valid for their
+        field are rejected like malformed cursors.
+        """
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = queryset.query.annotations[name].output_field
+            try:
+                if value is None:
+                    raise ValueError
+                cleaned.append(model_field.get_prep_value(
+                    model_field.to_python(value)))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def encode_cursor(self, obj, reverse):
+        """Return the url of the page seeking from obj."""
+        position = [self._field_value(obj, field) for field in self.ordering]
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('ascii'))
+
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded.decode('ascii'))
+
+    def _seek_filter(self, ordering, position):
+        """Build the predicate selecting rows after position in ordering.
+
+        For an ordering (a, -b, c) this is the expanded row comparison
+        a > x OR (a = x AND (b < y OR (b = y AND c > z))), and-ed with
+        a >= x so the database can bound the index range scan.
+        """
+        predicate = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name, lookup = self._lookup(field)
+            step = Q(**{f'{name}__{lookup}': value})
+            if predicate is not None:
+                step |= Q(**{name: value}) & predicate
+            predicate = step
+
+        name, lookup = self._lookup(ordering[0])
+        return Q(**{f'{name}__{lookup}e': position[0]}) & predicate
+
+    @staticmethod
+    def _lookup(field):
+        """Return the field name and the lookup seeking past a value."""
+        if field.startswith('-'):
+            return field[1:], 'lt'
+        return field, 'gt'
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _field_value(obj, field):
+        # Pages hold model instances, or dicts when fetched with values()
+        if isinstance(obj, dict):
+            return obj[field.lstrip('-')]
+        return getattr(obj, field.lstrip('-'))
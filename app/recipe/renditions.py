@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.models import ClockTimestamp, Recipe
+from core.storage import image_storage
+from recipe.cache import list_cache
+
+
+logger = logging.getLogger(__name__)
+
+# JPEG quality of the generated renditions
+RENDITION_QUALITY = 85
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_name(name, rendition):
+    """Return the storage name of a rendition of the image stored at name."""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'renditions', f'{stem}_{rendition}.jpg')
+
+
+def render(path, sizes):
+    """Write resized JPEG renditions of the image file at path.
+
+    Runs in a worker process, so it only uses Pillow and the filesystem.
+    sizes maps rendition names to the maximum length of their longest
+    side, the names of the written renditions are returned.
+    """
+    with Image.open(path) as original:
+        original.load()
+        if original.mode != 'RGB':
+            image = original.convert('RGB')
+        else:
+            image = original
+
+        for rendition, size in sizes.items():
+            resized = image.copy()
+            # Keeps the aspect ratio, never upscales
+            resized.thumbnail((size, size), Image.LANCZOS)
+
+            target = rendition_name(path, rendition)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Write next to the target and move it in place, so a
+            # rendition is never served half written; recipes sharing
+            # the stored image may render it at the same time
+            partial = f'{target}.{uuid.uuid4().hex}.partial'
+            resized.save(partial, 'JPEG', quality=RENDITION_QUALITY,
+                         optimize=True, progressive=True)
+            os.replace(partial, target)
+
+    return list(sizes)
+
+
+def get_executor():
+    """Return the process pool rendering images, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_RENDITION_WORKERS)
+        return _executor
+
+
+def enqueue(recipe):
+    """Render the renditions of the recipe image once it is committed."""
+    recipe_id, name = recipe.pk, recipe.image.name
+    transaction.on_commit(lambda: submit(recipe_id, name))
+
+
+def submit(recipe_id, name):
+    """Hand rendering of an image to the worker pool."""
+    sizes = settings.RECIPE_IMAGE_RENDITIONS
+    path = image_storage.path(name)
+
+    if not settings.RECIPE_IMAGE_RENDITION_WORKERS:
+        # Render in process, e.g. for development
+        _store(recipe_id, name, render(path, sizes))
+        return
+
+    future = get_executor().submit(render, path, sizes)
+    future.add_done_callback(
+        lambda future: _rendered(recipe_id, name, future))
+
+
+def _rendered(recipe_id, name, future):
+    """Record the renditions of a finished job."""
+    # Runs on a thread of the pool, not a request thread
+    try:
+        _store(recipe_id, name, future.result())
+    except Exception:
+        logger.exception('Rendering %s failed', name)
+    finally:
+        connection.close()
+
+
+def _store(recipe_id, name, renditions):
+    # Unless the image was replaced in the meantime
+    recipes = Recipe.objects.filter(pk=recipe_id, image=name)
+    if recipes.update(image_renditions=renditions,
+                      updated_at=ClockTimestamp()):
+        # Updates don't send signals, list responses include renditions
+        user_id = recipes.values_list('user_id', flat=True).first()
+        list_cache.invalidate(user_id)
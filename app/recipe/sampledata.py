@@ -0,0 +1,85 @@
+import random
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+
+def seed_recipes(user, recipes, tags=20, ingredients=50, seed=0):
+    """Give user recipes, tags and ingredients linked at random.
+
+    Every recipe gets 3 tags and 5 ingredients (fewer if the user has
+    less), the same seed always creates the same data.
+    """
+    rng = random.Random(seed)
+    tag_objs = Tag.objects.bulk_create(
+        [Tag(user=user, name=f'Tag {i}') for i in range(tags)])
+    ingredient_objs = Ingredient.objects.bulk_create(
+        [Ingredient(user=user, name=f'Ingredient {i}')
+         for i in range(ingredients)])
+    recipe_objs = Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}',
+               time_minutes=rng.randint(5, 120),
+               price=f'{rng.randint(100, 9999) / 100:.2f}')
+        for i in range(recipes)
+    ])
+
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+        for recipe in recipe_objs
+        for tag in rng.sample(tag_objs, min(3, tags))
+    ])
+    Recipe.ingredients.through.objects.bulk_create([
+        Recipe.ingredients.through(recipe_id=recipe.pk,
+                                   ingredient_id=ingredient.pk)
+        for recipe in recipe_objs
+        for ingredient in rng.sample(ingredient_objs, min(5, ingredients))
+    ])
+    # bulk_create doesn't send the signals maintaining these
+    Recipe.objects.filter(user=user).refresh_related()
+    RecipeStats.objects.rebuild([user.pk])
+    Tag.objects.filter(user=user).refresh_usage()
+    Ingredient.objects.filter(user=user).refresh_usage()
+    return recipe_objs
+
+
+# Vocabulary of the generated titles and names
+TAG_NAMES = [
+    'Vegan', 'Vegetarian', 'Dessert', 'Breakfast', 'Lunch', 'Dinner',
+    'Snack', 'Spicy', 'Quick', 'Healthy', 'Comfort food', 'Gluten free',
+    'Dairy free', 'Low carb', 'High protein', 'Italian', 'Mexican',
+    'Indian', 'Thai', 'Japanese', 'French', 'Greek', 'Chinese', 'Korean',
+    'Baking', 'Grill', 'Slow cooker', 'One pot', 'Salad', 'Soup',
+    'Party', 'Kids', 'Budget', 'Summer', 'Winter', 'Holiday',
+]
+INGREDIENT_NAMES = [
+    'Salt', 'Pepper', 'Olive oil', 'Butter', 'Garlic', 'Onion', 'Shallot',
+    'Tomato', 'Potato', 'Carrot', 'Celery', 'Leek', 'Spinach', 'Kale',
+    'Broccoli', 'Cauliflower', 'Zucchini', 'Eggplant', 'Bell pepper',
+    'Chili', 'Mushroom', 'Pumpkin', 'Sweet potato', 'Corn', 'Peas',
+    'Chickpeas', 'Lentils', 'Black beans', 'Rice', 'Pasta', 'Noodles',
+    'Flour', 'Sugar', 'Brown sugar', 'Honey', 'Maple syrup', 'Egg',
+    'Milk', 'Cream', 'Yogurt', 'Parmesan', 'Mozzarella', 'Feta',
+    'Cheddar', 'Chicken', 'Beef', 'Pork', 'Lamb', 'Salmon', 'Tuna',
+    'Shrimp', 'Tofu', 'Tempeh', 'Lemon', 'Lime', 'Orange', 'Apple',
+    'Banana', 'Strawberry', 'Blueberry', 'Coconut milk', 'Soy sauce',
+    'Ginger', 'Cumin', 'Paprika', 'Cinnamon', 'Basil', 'Parsley',
+    'Cilantro', 'Thyme', 'Rosemary', 'Oregano', 'Vinegar', 'Mustard',
+    'Walnuts', 'Almonds', 'Peanut butter', 'Chocolate', 'Vanilla',
+    'Oats', 'Bread', 'Avocado', 'Cucumber', 'Cabbage', 'Beetroot',
+]
+TITLE_ADJECTIVES = [
+    'Classic', 'Creamy', 'Crispy', 'Easy', 'Grilled', 'Roasted', 'Spicy',
+    'Smoky', 'Fresh', 'Hearty', 'Baked', 'Slow cooked', 'Zesty', 'Sweet',
+    'Garlicky', 'Rustic', 'Golden', 'Herby', 'Simple', 'Tangy',
+]
+TITLE_DISHES = [
+    'soup', 'salad', 'stew', 'curry', 'pasta', 'risotto', 'tacos',
+    'burger', 'pie', 'cake', 'bread', 'stir fry', 'casserole', 'bowl',
+    'pancakes', 'omelette', 'lasagna', 'chili', 'noodles', 'tart',
+]
+
+
+def vocabulary(words, count):
+    """Return count distinct names, numbering repeats of words."""
+    return [words[i % len(words)] if i < len(words)
+            else f'{words[i % len(words)]} {i // len(words) + 1}'
+            for i in range(count)]
@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from core.storage import image_storage
+from recipe.renditions import rendition_name
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,6 +25,34 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+def rendition_urls(name, renditions, request=None):
+    """Return the urls of the renditions of the image stored at name."""
+    if not name:
+        return {}
+
+    urls = {}
+    for rendition in renditions:
+        url = image_storage.url(rendition_name(name, rendition))
+        # Absolute like the urls of ImageField
+        urls[rendition] = request.build_absolute_uri(url) \
+            if request is not None else url
+
+    return urls
+
+
+class RenditionsField(serializers.Field):
+    """Urls of the generated renditions of a recipe image, by name."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return rendition_urls(recipe.image.name, recipe.image_renditions,
+                              self.context.get('request'))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serialize for recipe objects."""
 
@@ -32,12 +64,35 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
 
+    # Small versions of the image, for clients not needing the original
+    image_renditions = RenditionsField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link')
+                  'price', 'link', 'image_renditions')
         read_only = ('id',)
 
+    # Relations rendered as full objects when expanded
+    expandable_fields = {'ingredients': IngredientSerializer,
+                         'tags': TagSerializer}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        """Optionally render only fields, and nest the expand relations.
+
+        With expand, relations not in it are rendered as ids.
+        """
+        super().__init__(*args, **kwargs)
+        if expand is not None:
+            for name, nested in self.expandable_fields.items():
+                self.fields[name] = nested(many=True, read_only=True) \
+                    if name in expand else \
+                    serializers.PrimaryKeyRelatedField(many=True,
+                                                       read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail."""
@@ -49,10 +104,71 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """Validate one recipe of a bulk write without running queries."""
+    # Present when updating an existing recipe
+    id = serializers.IntegerField(required=False, min_value=1)
+
+    # Checked for the whole batch at once by recipe.bulk,
+    # instead of one query per primary key
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False)
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False)
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link')
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
+    # Empty right after an upload, renditions are generated afterwards
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_renditions')
         read_only_fields = ('id',)
+        # Uploads replace the image, they can't clear it
+        extra_kwargs = {'image': {'required': True, 'allow_null': False}}
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for the summary of a set of recipes."""
+    average_price = serializers.SerializerMethodField()
+    average_time_minutes = serializers.SerializerMethodField()
+    time_minutes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecipeStats
+        fields = ('recipe_count', 'average_price', 'average_time_minutes',
+                  'time_minutes')
+
+    def get_average_price(self, stats):
+        if not stats.recipe_count:
+            return None
+        return str((stats.price_total / stats.recipe_count)
+                   .quantize(Decimal('0.01')))
+
+    def get_average_time_minutes(self, stats):
+        if not stats.recipe_count:
+            return None
+        return round(stats.time_total / stats.recipe_count, 1)
+
+    def get_time_minutes(self, stats):
+        """Return the recipe counts by time bucket, the last unbounded."""
+        bounds = RecipeStats.TIME_BUCKETS + (None,)
+        counts = stats.time_buckets or [0] * len(bounds)
+        return [{'max': bound, 'count': count}
+                for bound, count in zip(bounds, counts)]
+
+
+class TagStatsSerializer(RecipeStatsSerializer):
+    """Serializer for the summary of the recipes having a tag."""
+    id = serializers.IntegerField(source='tag_id')
+    name = serializers.CharField(source='tag.name')
+
+    class Meta(RecipeStatsSerializer.Meta):
+        fields = ('id', 'name') + RecipeStatsSerializer.Meta.fields
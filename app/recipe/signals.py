@@ -0,0 +1,53 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.cache import list_cache
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_list_cache(sender, instance, **kwargs):
+    """Make the cached recipe lists of the owner of instance stale."""
+    list_cache.invalidate(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_list_cache_m2m(sender, instance, action, **kwargs):
+    """Make cached recipe lists stale when recipe relations change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Recipes, tags and ingredients are all owned by the same user
+        list_cache.invalidate(instance.user_id)
+
+
+def _invalidate_linked(instance):
+    """Make stale the cached lists of the other users linked to instance."""
+    # Their recipes render the name and id of the tag or ingredient
+    field = 'tag_ids' if isinstance(instance, Tag) else 'ingredient_ids'
+    user_ids = Recipe.objects.filter(**{f'{field}__contains': [instance.pk]}) \
+        .exclude(user_id=instance.user_id) \
+        .values_list('user_id', flat=True).distinct().order_by('user_id')
+    for user_id in user_ids:
+        list_cache.invalidate(user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def invalidate_list_cache_renamed(sender, instance, created, **kwargs):
+    """Make cached lists rendering a renamed tag or ingredient stale."""
+    if not created:
+        _invalidate_linked(instance)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def invalidate_list_cache_deleted(sender, instance, **kwargs):
+    """Make cached lists rendering a deleted tag or ingredient stale."""
+    # Before the recipes stop referencing it, see core.signals
+    _invalidate_linked(instance)
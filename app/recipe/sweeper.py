@@ -0,0 +1,109 @@
+import os
+import time
+
+from django.db import transaction
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+from recipe.renditions import rendition_name
+
+
+# Directory of the uploaded recipe images and their renditions
+IMAGES_DIR = 'uploads/recipe'
+
+# Rows read at a time from the recipes
+CHUNK_SIZE = 2000
+
+
+def referenced_names():
+    """Return the storage names of the images and renditions in use."""
+    names = set()
+    rows = Recipe.objects.exclude(image__isnull=True).exclude(image='') \
+        .values_list('image', 'image_renditions') \
+        .iterator(chunk_size=CHUNK_SIZE)
+    for image, renditions in rows:
+        names.add(image)
+        names.update(rendition_name(image, rendition)
+                     for rendition in renditions)
+    return names
+
+
+def _walk(path):
+    """Yield the DirEntry of every file below path."""
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def find_orphans(grace, now=None):
+    """Yield the (name, size) of the unreferenced files.
+
+    Files modified in the last grace seconds are skipped: they may be
+    uploads or renditions whose recipe isn't committed yet. Leftover
+    partial files are orphans like the others.
+    """
+    referenced = referenced_names()
+    cutoff = (time.time() if now is None else now) - grace
+    for entry in _walk(image_storage.path(IMAGES_DIR)):
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            continue
+        name = os.path.relpath(entry.path, image_storage.location) \
+            .replace(os.sep, '/')
+        if name not in referenced:
+            yield name, stat.st_size
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def sweep(grace, batch_size=500, dry_run=False):
+    """Delete the orphaned recipe images, yielding progress per batch.
+
+    Each batch yields the number of files deleted and of bytes
+    reclaimed. With dry_run nothing is deleted.
+    """
+    now = time.time()
+    for batch in _batches(find_orphans(grace, now), batch_size):
+        deleted = reclaimed = 0
+        with transaction.atomic():
+            # Uploads of the same content hold the lock until their
+            # reference is committed, see core.storage
+            counts = ImageBlob.objects.lock(name for name, size in batch)
+            for name, size in batch:
+                # Referenced again since the recipes were read
+                if counts.get(name, 0) > 0:
+                    continue
+                path = image_storage.path(name)
+                try:
+                    # Reused since it was found
+                    if os.stat(path).st_mtime > now - grace:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+                reclaimed += size
+
+            if dry_run:
+                transaction.set_rollback(True)
+            else:
+                ImageBlob.objects.filter(name__in=list(counts),
+                                         ref_count__lte=0).delete()
+        yield deleted, reclaimed
@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+def sample_recipe(user, **params):
+    defaults = {'title': 'Sample', 'time_minutes': 10, 'price': '5.00'}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class AutocompleteApiTests(TestCase):
+    """Test suggesting tags and ingredients by name prefix."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ranked_by_usage(self):
+        """Test that matches are case insensitive, most used first."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        salmon = Ingredient.objects.create(user=self.user, name='salmon')
+        Ingredient.objects.create(user=self.user, name='Sage')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        for i in range(2):
+            sample_recipe(self.user).ingredients.add(salmon)
+        sample_recipe(self.user).ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL,
+                              {'prefix': 'SAL'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': salmon.id, 'name': 'salmon'},
+                                    {'id': salt.id, 'name': 'Salt'}])
+
+    def test_limit(self):
+        """Test that at most limit suggestions are returned."""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Vegan {i}')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL,
+                              {'prefix': 'veg', 'limit': 2})
+
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Vegan 0', 'Vegan 1'])
+
+    def test_limited_to_user(self):
+        """Test that other users' names aren't suggested."""
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass')
+        Tag.objects.create(user=other, name='Vegan')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'veg'})
+
+        self.assertEqual(res.data, [])
+
+    def test_like_wildcards_escaped(self):
+        """Test that prefixes match literally."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'prefix': '%'})
+
+        self.assertEqual(res.data, [])
+
+    def test_invalid_params(self):
+        """Test that a prefix and a numeric limit are required."""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL,
+                              {'prefix': 'a', 'limit': 'many'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UsageTests(TestCase):
+    """Test the recipe counts of tags and ingredients."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Tofu')
+
+    def assertUsage(self, tag_usage, ingredient_usage):
+        self.tag.refresh_from_db()
+        self.ingredient.refresh_from_db()
+        self.assertEqual((self.tag.usage, self.ingredient.usage),
+                         (tag_usage, ingredient_usage))
+
+    def test_usage_maintained(self):
+        """Test that linking, unlinking and deleting update usage."""
+        first, second = sample_recipe(self.user), sample_recipe(self.user)
+        first.tags.add(self.tag)
+        first.ingredients.add(self.ingredient)
+        self.tag.recipe_set.add(second)
+        self.assertUsage(2, 1)
+
+        first.tags.clear()
+        first.ingredients.remove(self.ingredient)
+        self.assertUsage(1, 0)
+
+        second.ingredients.set([self.ingredient])
+        self.tag.recipe_set.clear()
+        self.assertUsage(0, 1)
+
+        second.delete()
+        self.assertUsage(0, 0)
+
+    def test_usage_after_bulk_writes(self):
+        """Test that bulk writes update usage."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag)
+
+        client.post(reverse('recipe:recipe-bulk'), [
+            {'id': recipe.id, 'tags': [],
+             'ingredients': [self.ingredient.id]},
+            {'title': 'New', 'time_minutes': 5, 'price': '1.00',
+             'ingredients': [self.ingredient.id]},
+        ], format='json')
+
+        self.assertUsage(0, 2)
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class PrivateBulkRecipeApiTests(TestCase):
+    """Test creating and updating recipes in bulk."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Tofu')
+
+    def test_bulk_create_recipes(self):
+        """Test creating several recipes with their relations."""
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': 10, 'price': '5.00',
+             'tags': [self.tag.id], 'ingredients': [self.ingredient.id]}
+            for i in range(20)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 20)
+        self.assertTrue(all(item['status'] == 'created' for item in res.data))
+        recipe = Recipe.objects.get(id=res.data[0]['data']['id'])
+        self.assertEqual(recipe.title, 'Recipe 0')
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        # Denormalized fields are maintained despite the bulk insert
+        self.assertEqual(recipe.tag_ids, [self.tag.id])
+        self.assertEqual(recipe.ingredient_ids, [self.ingredient.id])
+
+    def test_bulk_queries_independent_of_size(self):
+        """Test that the number of queries doesn't grow with the batch."""
+        def payload(count):
+            return [{'title': 'Recipe', 'time_minutes': 10, 'price': '5.00',
+                     'tags': [self.tag.id]} for _ in range(count)]
+
+        # Warm up, so both measured requests do the same work
+        self.client.post(BULK_URL, payload(1), format='json')
+
+        with self.assertNumQueries(12):
+            self.client.post(BULK_URL, payload(2), format='json')
+        with self.assertNumQueries(12):
+            self.client.post(BULK_URL, payload(50), format='json')
+
+    def test_bulk_update_recipes(self):
+        """Test updating existing recipes along with creating new ones."""
+        recipe = Recipe.objects.create(user=self.user, title='Old title',
+                                       time_minutes=10, price=5.)
+        recipe.tags.add(self.tag)
+        payload = [
+            {'id': recipe.id, 'title': 'New title', 'tags': []},
+            {'title': 'Created', 'time_minutes': 5, 'price': '2.50'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data],
+                         ['updated', 'created'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'New title')
+        self.assertEqual(recipe.time_minutes, 10)
+        self.assertEqual(recipe.tags.count(), 0)
+        self.assertEqual(recipe.tag_ids, [])
+
+    def test_bulk_invalid_item_rolls_back(self):
+        """Test that nothing is saved if any item is invalid."""
+        other_user = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass123'
+        )
+        other_tag = Tag.objects.create(user=other_user, name='Private')
+        payload = [
+            {'title': 'Valid', 'time_minutes': 5, 'price': '2.50'},
+            {'title': 'Foreign tag', 'time_minutes': 5, 'price': '2.50',
+             'tags': [other_tag.id]},
+            {'title': 'Missing fields'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(res.data[0])
+        self.assertIn('tags', res.data[1]['errors'])
+        self.assertIn('price', res.data[2]['errors'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_non_atomic_saves_valid_items(self):
+        """Test that valid items are saved when atomic is disabled."""
+        payload = [
+            {'title': 'Valid', 'time_minutes': 5, 'price': '2.50'},
+            {'id': 999999, 'title': 'Unknown recipe'},
+        ]
+
+        res = self.client.post(f'{BULK_URL}?atomic=false', payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data],
+                         ['created', 'invalid'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_bulk_requires_list(self):
+        """Test that the payload must be a list."""
+        res = self.client.post(BULK_URL, {'title': 'Recipe'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,118 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import URLResolver
+
+from core.models import Tag, Recipe
+from recipe import urls as recipe_urls
+from recipe.management.commands.benchmark_endpoints import Command
+from user import urls as user_urls
+
+
+def url_names(module):
+    """Return the url names of an app, its own prefixed by app_name."""
+    names = set()
+    for pattern in module.urlpatterns:
+        if isinstance(pattern, URLResolver):
+            # Router urls, already prefixed by their basename
+            names.update(url.name for url in pattern.url_patterns)
+        else:
+            names.add(f'{module.app_name}-{pattern.name}')
+    return names
+
+
+class CommandTests(TestCase):
+
+    def test_benchmark_serializers(self):
+        """Test benchmarking the fast path leaves no rows behind."""
+        out = StringIO()
+        call_command('benchmark_serializers', rows=20, repeat=1, stdout=out)
+
+        self.assertIn('identical output', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_seed_data(self):
+        """Test seeding users with linked recipes, tags and ingredients."""
+        out = StringIO()
+        call_command('seed_data', users=3, recipes=10, tags=6,
+                     ingredients=12, batch_size=2, seed=1, stdout=out)
+
+        self.assertIn('rows/s', out.getvalue())
+        users = get_user_model().objects.order_by('email')
+        self.assertEqual([user.email for user in users],
+                         [f'seed{i}@example.com' for i in range(3)])
+        self.assertTrue(users[0].check_password('password'))
+        self.assertEqual(Tag.objects.filter(user=users[0]).count(), 6)
+
+        for recipe in Recipe.objects.all():
+            # Links stay within a user, and match the id arrays
+            self.assertLessEqual(
+                set(recipe.tags.values_list('user_id', flat=True)),
+                {recipe.user_id})
+            self.assertEqual(
+                recipe.tag_ids,
+                list(recipe.tags.order_by('id').values_list('id', flat=True)))
+            self.assertEqual(
+                recipe.ingredient_ids,
+                list(recipe.ingredients.order_by('id')
+                     .values_list('id', flat=True)))
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=True).exists())
+
+    def test_seed_data_deterministic(self):
+        """Test that a seed always generates the same recipes."""
+        call_command('seed_data', users=2, recipes=5, tags=6,
+                     ingredients=12, seed=7, stdout=StringIO())
+        titles = list(Recipe.objects.order_by('id')
+                      .values_list('title', 'price'))
+        call_command('seed_data', users=2, recipes=5, tags=6,
+                     ingredients=12, seed=7, email_prefix='again',
+                     stdout=StringIO())
+
+        self.assertEqual(list(Recipe.objects.order_by('id')
+                              .values_list('title', 'price'))[len(titles):],
+                         titles)
+
+
+@override_settings(RECIPE_IMAGE_RENDITION_WORKERS=0)
+class BenchmarkEndpointsTests(TransactionTestCase):
+
+    def test_benchmark_endpoints(self):
+        """Test benchmarking every route and writing the results."""
+        out = StringIO()
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_endpoints', recipes=5, requests=2,
+                         warmup=0, concurrency=2, output=output.name,
+                         stdout=out)
+            results = json.load(output)
+
+        routes = {result['route']: result for result in results['routes']}
+        self.assertIn('recipe-export', routes)
+        self.assertIn('user-token', routes)
+        for result in routes.values():
+            self.assertEqual(result['requests'], 2)
+            self.assertEqual(result['errors'], 0, result)
+            self.assertIsNotNone(result['p99_ms'])
+        self.assertGreater(routes['recipe-detail']['queries_per_request'], 0)
+        # The benchmark's users and their data are removed
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_covers_every_url(self):
+        """Test that every url has a benchmarked route."""
+        routes = Command()._routes()
+
+        for name in url_names(recipe_urls) | url_names(user_urls):
+            # Variants of a url are named after it, e.g. recipe-list-filtered
+            self.assertTrue(any(route == name or route.startswith(f'{name}-')
+                                for route in routes), name)
+
+    def test_benchmark_unknown_route(self):
+        """Test that unknown routes are rejected."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_endpoints', route=['nope'])
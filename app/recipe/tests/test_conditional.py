@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe.cache import list_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetTests(TestCase):
+    """Test answering recipe reads with 304 Not Modified."""
+
+    def setUp(self):
+        list_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=30, price='7.00')
+        self.recipe.tags.add(self.tag)
+
+    def assertNotModified(self, url, etag, **params):
+        res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def assertModified(self, url, etag, **params):
+        res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        return res['ETag']
+
+    def test_list_validators(self):
+        """Test that lists carry an ETag and their latest change."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', res)
+
+        self.assertNotModified(RECIPES_URL, res['ETag'])
+
+    def test_list_not_modified_from_cache(self):
+        """Test that cached lists are revalidated with a single query."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        # Authentication is forced, the ETag only needs the user's version
+        with self.assertNumQueries(1):
+            self.assertNotModified(RECIPES_URL, etag)
+
+    def test_list_etag_depends_on_params(self):
+        """Test that another representation has another ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.assertModified(RECIPES_URL, etag, fields='id')
+
+    def test_list_modified_by_writes(self):
+        """Test that editing, tagging and deleting change the ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Dal'})
+        etag = self.assertModified(RECIPES_URL, etag)
+
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Hot'))
+        etag = self.assertModified(RECIPES_URL, etag)
+
+        other = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='1.00')
+        etag = self.assertModified(RECIPES_URL, etag)
+        other.delete()
+        self.assertModified(RECIPES_URL, etag)
+
+    def test_detail_not_modified(self):
+        """Test revalidating a recipe by ETag or by date."""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        self.assertNotModified(url, res['ETag'])
+        res = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_by_tag_rename(self):
+        """Test that renaming a nested tag changes the recipe's ETag."""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.tag.name = 'Plant based'
+        self.tag.save()
+
+        self.assertModified(url, etag)
+
+    def test_detail_of_other_user(self):
+        """Test that preconditions don't reveal other users' recipes."""
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass')
+        recipe = Recipe.objects.create(
+            user=other, title='Soup', time_minutes=5, price='1.00')
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
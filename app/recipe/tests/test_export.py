@@ -0,0 +1,125 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe import export
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeExportTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client.force_authenticate(self.user)
+
+    def _download(self):
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return zipfile.ZipFile(io.BytesIO(b''.join(res.streaming_content)))
+
+    def _manifest(self, archive):
+        with archive.open(export.MANIFEST_NAME) as manifest:
+            return [json.loads(line) for line in manifest]
+
+    def test_export_requires_authentication(self):
+        """Test that anonymous users can't export."""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_manifest(self):
+        """Test that the manifest holds the user's data only."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price='4.50')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=5, price='1.00')
+
+        with self._download() as archive:
+            self.assertEqual(archive.namelist(), [export.MANIFEST_NAME])
+            lines = self._manifest(archive)
+
+        self.assertEqual(lines, [
+            {'type': 'tag', 'id': tag.id, 'name': 'Vegan'},
+            {'type': 'ingredient', 'id': ingredient.id, 'name': 'Salt'},
+            {'type': 'recipe', 'id': recipe.id, 'title': 'Soup',
+             'time_minutes': 10, 'price': '4.50', 'link': '',
+             'tags': [tag.id], 'ingredients': [ingredient.id],
+             'image': None},
+        ])
+
+    def test_export_images(self):
+        """Test that recipe images are added to the archive."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Cake', time_minutes=60, price='8.00')
+        # Larger than a chunk, to check it is copied whole
+        content = bytes(range(256)) * 1000
+        recipe.image.save('cake.jpg', ContentFile(content))
+        missing = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=30, price='6.00',
+            image='uploads/recipe/missing.jpg')
+
+        with self._download() as archive:
+            self.assertIsNone(archive.testzip())
+            path = self._manifest(archive)[0]['image']
+            self.assertEqual(archive.read(path), content)
+            self.assertEqual(archive.getinfo(path).compress_type,
+                             zipfile.ZIP_STORED)
+            # Files gone from the storage are left out
+            self.assertEqual(len(archive.namelist()), 2)
+
+        self.assertTrue(missing.image)
+
+    def test_export_shared_image_once(self):
+        """Test that an image shared by recipes is archived once."""
+        for title in ('Cake', 'Pie'):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price='1.00')
+            recipe.image.save('photo.jpg', ContentFile(b'same photo'))
+
+        with self._download() as archive:
+            paths = [row['image'] for row in self._manifest(archive)]
+            self.assertEqual(paths[0], paths[1])
+            self.assertEqual(len(archive.namelist()), 2)
+
+    def test_stream_archive_yields_pieces(self):
+        """Test that the archive is produced in several pieces."""
+        Tag.objects.bulk_create(
+            [Tag(user=self.user, name=f'Tag {i}') for i in range(50)])
+
+        pieces = [piece for piece in export.stream_archive(self.user)
+                  if piece]
+
+        self.assertGreater(len(pieces), 1)
+        with zipfile.ZipFile(io.BytesIO(b''.join(pieces))) as archive:
+            self.assertEqual(len(self._manifest(archive)), 50)
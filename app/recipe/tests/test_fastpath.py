@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe import serializers
+from recipe.cache import list_cache
+from recipe.fastpath import get_row_mapper
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class FastListSerializationTests(TestCase):
+    """Test the compiled list serialization matches the serializers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vegan', 'Dessert', 'Spicy')]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name)
+                       for name in ('Salt', 'Kale')]
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Curry {i}', time_minutes=i,
+                price=f'{i}.5', link='https://example.com' if i else '')
+            recipe.tags.add(*tags[i % 3:])
+            recipe.ingredients.add(*ingredients[:i % 2])
+        recipe.image = 'uploads/recipe/curry.jpg'
+        recipe.image_renditions = ['thumbnail']
+        recipe.save()
+
+    def _compare(self, url, params=None):
+        """Assert both serializations render the same bytes."""
+        list_cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            slow = self.client.get(url, params)
+        list_cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            fast = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(fast.get('Link'), slow.get('Link'))
+
+    def test_tags_identical(self):
+        """Test listing tags."""
+        self._compare(TAGS_URL, {'page_size': 2})
+
+    def test_ingredients_identical(self):
+        """Test listing ingredients."""
+        self._compare(INGREDIENTS_URL)
+
+    def test_recipes_identical(self):
+        """Test listing recipes, with related ids, prices and images."""
+        self._compare(RECIPES_URL)
+        self._compare(RECIPES_URL, {'page_size': 2})
+
+    def test_search_results_identical(self):
+        """Test listing search results paginated by rank."""
+        self._compare(RECIPES_URL, {'search': 'curry', 'page_size': 2})
+
+    def test_fast_list_single_query(self):
+        """Test that relations come from the denormalized columns."""
+        list_cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            # The user's version, then the recipes
+            with self.assertNumQueries(2):
+                self.client.get(RECIPES_URL)
+
+    def test_nested_serializer_not_compiled(self):
+        """Test that serializers with nested objects aren't compiled."""
+        self.assertIsNotNone(get_row_mapper(serializers.RecipeSerializer))
+        self.assertIsNone(get_row_mapper(
+            serializers.RecipeDetailSerializer))
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe.cache import ListResponseCache, list_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class RecipeListCacheTests(TestCase):
+    """Test caching of recipe list responses."""
+
+    def setUp(self):
+        list_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5.)
+
+    def test_repeated_list_cached(self):
+        """Test that a repeated request only reads the user's version."""
+        first = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(1):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual((list_cache.hits, list_cache.misses), (1, 1))
+
+    def test_normalized_params_share_entry(self):
+        """Test that the same filter written differently is a hit."""
+        self.client.get(RECIPES_URL, {'tags': '2,1', 'match': 'any'})
+        self.client.get(RECIPES_URL, {'match': 'any', 'tags': '1, 2,2'})
+
+        self.assertEqual(list_cache.hits, 1)
+
+    def test_users_cached_separately(self):
+        """Test that users never see each other's cached lists."""
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass123'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_recipe_save_invalidates(self):
+        """Test that editing a recipe makes the cached list stale."""
+        self.client.get(RECIPES_URL)
+        self.recipe.title = 'New title'
+        self.recipe.save()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data[0]['title'], 'New title')
+
+    def test_m2m_change_invalidates(self):
+        """Test that linking a tag makes the cached list stale."""
+        self.client.get(RECIPES_URL)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        list_cache.clear()
+        self.client.get(RECIPES_URL)
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+        self.assertEqual(list_cache.hits, 0)
+
+    def test_renamed_tag_invalidates_other_users(self):
+        """Test that renaming a tag makes the lists of its users stale."""
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass123'
+        )
+        tag = Tag.objects.create(user=other, name='Vegan')
+        self.recipe.tags.add(tag)
+        self.client.get(RECIPES_URL, {'search': 'vegan'})
+        tag.name = 'Spicy'
+        tag.save()
+
+        res = self.client.get(RECIPES_URL, {'search': 'vegan'})
+
+        self.assertEqual(res.data, [])
+
+    def test_deleted_tag_invalidates_other_users(self):
+        """Test that deleting a tag makes the lists of its users stale."""
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass123'
+        )
+        tag = Tag.objects.create(user=other, name='Vegan')
+        self.recipe.tags.add(tag)
+        self.client.get(RECIPES_URL)
+        tag.delete()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data[0]['tags'], [])
+
+    def test_bulk_write_invalidates(self):
+        """Test that bulk writes, which don't send signals, invalidate."""
+        self.client.get(RECIPES_URL)
+        self.client.post(BULK_URL, [{'title': 'New', 'time_minutes': 5,
+                                     'price': '2.00'}], format='json')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_invalidation_shared_by_processes(self):
+        """Test that a write invalidates the caches of other processes."""
+        other_process = ListResponseCache()
+        key = other_process.key(self.user.pk, QueryDict())
+        other_process.set(key, [], {})
+
+        list_cache.invalidate(self.user.pk)
+
+        self.assertNotEqual(other_process.key(self.user.pk, QueryDict()),
+                            key)
+
+    def test_cache_bounded(self):
+        """Test that the cache evicts entries beyond its size."""
+        cache = ListResponseCache(max_size=2)
+        for page_size in range(5):
+            key = cache.key(self.user.pk,
+                            QueryDict(f'page_size={page_size}'))
+            cache.set(key, [], {})
+
+        self.assertLessEqual(len(cache.backend), 2)
@@ -0,0 +1,124 @@
+import base64
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def page_links(response):
+    """Return the pagination links in the response Link header by rel."""
+    header = response.get('Link', '')
+    return {rel: url for url, rel in
+            re.findall(r'<([^>]*)>; rel="(\w+)"', header)}
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the recipe API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_first_page_limited(self):
+        """Test that a page holds at most page_size results."""
+        for i in range(5):
+            Recipe.objects.create(user=self.user, title=f'Recipe {i}',
+                                  time_minutes=5, price=5.)
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        expected = list(Recipe.objects.order_by('-id')
+                        .values_list('id', flat=True)[:2])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in res.data], expected)
+        self.assertIn('next', page_links(res))
+        self.assertNotIn('prev', page_links(res))
+
+    def test_follow_next_links(self):
+        """Test that following next links visits every row exactly once."""
+        # Duplicate names, so the id tie-breaker is needed
+        for name in ['Vegan', 'Dessert', 'Vegan', 'Spicy', 'Dessert']:
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        url, params = TAGS_URL, {'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(tag['id'] for tag in res.data)
+            url, params = page_links(res).get('next'), None
+
+        expected = list(Tag.objects.order_by('-name', 'id')
+                        .values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link(self):
+        """Test that the previous link returns the preceding page."""
+        for i in range(4):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        first = self.client.get(TAGS_URL, {'page_size': 2})
+        second = self.client.get(page_links(first)['next'])
+        previous = self.client.get(page_links(second)['prev'])
+
+        self.assertEqual(previous.data, first.data)
+
+    def test_follow_search_results(self):
+        """Test paginating search results ordered by rank."""
+        for i in range(3):
+            Recipe.objects.create(user=self.user, title=f'Curry {i}',
+                                  time_minutes=5, price=5.)
+        Recipe.objects.create(user=self.user, title='Curry curry curry',
+                              time_minutes=5, price=5.)
+
+        first = self.client.get(RECIPES_URL,
+                                {'search': 'curry', 'page_size': 2})
+        second = self.client.get(page_links(first)['next'])
+
+        ids = [recipe['id'] for recipe in first.data + second.data]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(first.data[0]['title'], 'Curry curry curry')
+
+    def test_no_count_query(self):
+        """Test that a page is fetched in a single query."""
+        for i in range(3):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        with self.assertNumQueries(1):
+            self.client.get(TAGS_URL, {'page_size': 2})
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        res = self.client.get(TAGS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        """Test that cursors with values of the wrong type are rejected."""
+        for url, position in ((RECIPES_URL, ['abc']),
+                              (RECIPES_URL, [[1]]),
+                              (RECIPES_URL, [None]),
+                              (TAGS_URL, ['Tag', {'id': 1}]),
+                              (RECIPES_URL + '?search=curry', [[], 1])):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position}).encode()).decode()
+
+            res = self.client.get(url, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             position)
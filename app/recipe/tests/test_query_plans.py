@@ -0,0 +1,231 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.cache import list_cache
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+# Tables large enough in production that scanning them is a regression
+LARGE_TABLES = {
+    'core_tag', 'core_ingredient', 'core_recipe', 'core_recipe_tags',
+    'core_recipe_ingredients',
+}
+
+USERS = 20
+TAGS_PER_USER = 50
+INGREDIENTS_PER_USER = 100
+RECIPES_PER_USER = 500
+# Links per recipe
+RECIPE_TAGS = 3
+RECIPE_INGREDIENTS = 6
+
+# Planner settings making sequential scans and sorts look prohibitively
+# expensive while EXPLAINing, so the plans show whether an index can
+# serve each query regardless of the costs at the seeded data size
+PLANNER_SETTINGS = ('enable_seqscan', 'enable_sort')
+
+# Rows are generated in SQL, creating them through the ORM takes
+# minutes; every recipe links to a deterministic mix of its user's
+# tags and ingredients
+SEED_SQL = [
+    f"""INSERT INTO core_tag (user_id, name, usage)
+        SELECT u.id, 'Tag ' || n, 0 FROM core_user u,
+        generate_series(0, {TAGS_PER_USER - 1}) n""",
+    f"""INSERT INTO core_ingredient (user_id, name, usage)
+        SELECT u.id, 'Ingredient ' || n, 0 FROM core_user u,
+        generate_series(0, {INGREDIENTS_PER_USER - 1}) n""",
+    f"""INSERT INTO core_recipe
+        (user_id, title, time_minutes, price, link, image_renditions,
+         tag_ids, ingredient_ids, updated_at)
+        SELECT u.id, 'Recipe ' || n || ' ' || md5(u.id || '-' || n),
+        10, 5, '', '{{}}', '{{}}', '{{}}', now() FROM core_user u,
+        generate_series(0, {RECIPES_PER_USER - 1}) n""",
+    f"""INSERT INTO core_recipe_tags (recipe_id, tag_id)
+        SELECT r.id, t.id FROM core_recipe r,
+        generate_series(0, {RECIPE_TAGS - 1}) j
+        JOIN core_tag t ON TRUE
+        WHERE t.user_id = r.user_id
+        AND t.name = 'Tag ' || (r.id * 7 + j * 11) % {TAGS_PER_USER}
+        ON CONFLICT DO NOTHING""",
+    f"""INSERT INTO core_recipe_ingredients (recipe_id, ingredient_id)
+        SELECT r.id, i.id FROM core_recipe r,
+        generate_series(0, {RECIPE_INGREDIENTS - 1}) j
+        JOIN core_ingredient i ON TRUE
+        WHERE i.user_id = r.user_id
+        AND i.name = 'Ingredient ' || (r.id * 13 + j * 17)
+            % {INGREDIENTS_PER_USER}
+        ON CONFLICT DO NOTHING""",
+]
+
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan."""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+class QueryPlanTests(TestCase):
+    """Test that the endpoints' queries are served by indexes.
+
+    Seeds rows spread over many users, then EXPLAINs every query an
+    endpoint runs and fails on sequential scans of large tables, and on
+    sorts of rows that should come in index order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        get_user_model().objects.bulk_create([
+            get_user_model()(email=f'user{i}@londonappdev.com')
+            for i in range(USERS)])
+        cls.user = get_user_model().objects.order_by('id').first()
+
+        with connection.cursor() as cursor:
+            for sql in SEED_SQL:
+                cursor.execute(sql)
+        Recipe.objects.refresh_related()
+        with connection.cursor() as cursor:
+            # Planner statistics of the seeded tables
+            for table in LARGE_TABLES:
+                cursor.execute(f'ANALYZE {table}')
+
+        cls.tag = Tag.objects.filter(user=cls.user).first()
+        cls.ingredient = Ingredient.objects.filter(user=cls.user).first()
+        cls.recipe = Recipe.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        list_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            for setting in PLANNER_SETTINGS:
+                cursor.execute(f'SET {setting} = off')
+            try:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+            finally:
+                for setting in PLANNER_SETTINGS:
+                    cursor.execute(f'RESET {setting}')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertPlanUsesIndexes(self, sql, allow_sort=False):
+        """Fail if the plan of sql scans a large table or sorts rows."""
+        plan = self._explain(sql)
+        for node in plan_nodes(plan):
+            if node['Node Type'] == 'Seq Scan':
+                self.assertNotIn(
+                    node['Relation Name'], LARGE_TABLES,
+                    f'Sequential scan in {sql}:\n{json.dumps(plan)}')
+            if not allow_sort:
+                self.assertNotIn(
+                    node['Node Type'], ('Sort', 'Incremental Sort'),
+                    f'Sort in {sql}:\n{json.dumps(plan)}')
+
+    def assertEndpointUsesIndexes(self, url, params=None, allow_sort=False):
+        """Fail if a query run by GETting url isn't served by indexes.
+
+        Only the main query, the first one past the lookup of the user's
+        list version, must return its rows in index order unless
+        allow_sort; the prefetches that follow sort the relations of one
+        page at most.
+        """
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        queries = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        main = next(index for index, sql in enumerate(queries)
+                    if '"core_recipeversion"' not in sql)
+        for index, sql in enumerate(queries):
+            self.assertPlanUsesIndexes(sql, allow_sort or index != main)
+        return res
+
+    def test_list_tags(self):
+        """Test that tags are read in index order."""
+        res = self.assertEndpointUsesIndexes(TAGS_URL, {'page_size': 10})
+
+        # And the next page seeks into the index
+        next_url = res['Link'].split('>')[0].lstrip('<')
+        self.assertEndpointUsesIndexes(next_url)
+
+    def test_list_ingredients(self):
+        """Test that ingredients are read in index order."""
+        self.assertEndpointUsesIndexes(INGREDIENTS_URL, {'page_size': 10})
+
+    def test_list_recipes(self):
+        """Test that recipes and their relations are read by index."""
+        res = self.assertEndpointUsesIndexes(RECIPES_URL, {'page_size': 10})
+
+        next_url = res['Link'].split('>')[0].lstrip('<')
+        self.assertEndpointUsesIndexes(next_url)
+
+    def test_filter_recipes(self):
+        """Test that tag and ingredient filters use the GIN indexes."""
+        # The planner may sort the few matching recipes by id
+        for params in ({'tags': self.tag.id},
+                       {'ingredients': self.ingredient.id, 'match': 'all'}):
+            self.assertEndpointUsesIndexes(RECIPES_URL, params,
+                                           allow_sort=True)
+
+    def test_search_recipes(self):
+        """Test that searching uses the search vector index."""
+        # Ordering by rank always needs a sort
+        self.assertEndpointUsesIndexes(RECIPES_URL, {'search': 'recipe 1'},
+                                       allow_sort=True)
+
+    def test_retrieve_recipe(self):
+        """Test that a recipe and its relations are read by index."""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+        self.assertEndpointUsesIndexes(url)
+
+    def test_recipes_of_tag(self):
+        """Test that the m2m tables are indexed from the reverse side."""
+        for model, field, value, index in (
+                (Recipe.tags.through, 'tag_id', self.tag.id,
+                 'core_recipe_tags_tag_recipe_idx'),
+                (Recipe.ingredients.through, 'ingredient_id',
+                 self.ingredient.id, 'core_recipe_ingr_ingr_recipe_idx')):
+            queryset = model.objects.filter(**{field: value}) \
+                .values_list('recipe_id', flat=True)
+
+            plan = self._explain(str(queryset.query))
+
+            self.assertIn(index, [node.get('Index Name')
+                                  for node in plan_nodes(plan)])
+
+    def test_autocomplete(self):
+        """Test that name prefixes are looked up in the prefix indexes."""
+        for basename, prefix, index in (
+                ('tag', 'TAG 49', 'core_tag_user_lower_name_idx'),
+                ('ingredient', 'Ingredient 99',
+                 'core_ingr_user_lower_name_idx')):
+            url = reverse(f'recipe:{basename}-autocomplete')
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.get(url, {'prefix': prefix})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res.data)
+
+            # Ranking the matches by usage needs a sort
+            sql = context.captured_queries[-1]['sql']
+            self.assertPlanUsesIndexes(sql, allow_sort=True)
+            self.assertIn(index, [node.get('Index Name')
+                                  for node in plan_nodes(self._explain(sql))])
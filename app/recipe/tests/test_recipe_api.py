@@ -1,5 +1,6 @@
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
@@ -120,6 +121,37 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_recipes_constant_queries(self):
+        """Test listing recipes doesn't run extra queries per recipe."""
+        for i in range(10):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}'))
+
+        # One query for the user's version, one for the recipes, one per
+        # prefetched relation
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_view_recipe_detail_constant_queries(self):
+        """Test retrieving a recipe prefetches its nested relations."""
+        recipe = sample_recipe(user=self.user)
+        for i in range(5):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 5)
+        self.assertEqual(len(res.data['ingredients']), 5)
+
     def test_create_basic_recipe(self):
         """Test creating recipe."""
         payload = {'title': 'Chocolate cheesecake',
@@ -223,6 +255,87 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_filter_recipes_match_all_tags(self):
+        """Test returning recipes having all the given tags."""
+        vegan = sample_tag(user=self.user, name='Vegan')
+        dessert = sample_tag(user=self.user, name='Dessert')
+        recipe_1 = sample_recipe(user=self.user, title='Vegan brownies')
+        recipe_1.tags.add(vegan, dessert)
+        recipe_2 = sample_recipe(user=self.user, title='Vegan curry')
+        recipe_2.tags.add(vegan)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{vegan.id},{dessert.id}',
+                                            'match': 'all'})
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe_1.id])
+
+    def test_filter_recipes_match_any_no_duplicates(self):
+        """Test recipes matching several ids are returned once."""
+        vegan = sample_tag(user=self.user, name='Vegan')
+        dessert = sample_tag(user=self.user, name='Dessert')
+        recipe = sample_recipe(user=self.user, title='Vegan brownies')
+        recipe.tags.add(vegan, dessert)
+
+        res = self.client.get(RECIPES_URL,
+                              {'tags': f'{vegan.id},{dessert.id}'})
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe.id])
+
+    def test_filter_recipes_by_tags_and_ingredients(self):
+        """Test tag and ingredient constraints are combined."""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipe_1 = sample_recipe(user=self.user, title='Both')
+        recipe_1.tags.add(tag)
+        recipe_1.ingredients.add(ingredient)
+        recipe_2 = sample_recipe(user=self.user, title='Tag only')
+        recipe_2.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {'tags': tag.id,
+                                            'ingredients': ingredient.id,
+                                            'match': 'all'})
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe_1.id])
+
+    def test_search_recipes(self):
+        """Test searching recipes by title, tag and ingredient names."""
+        recipe_1 = sample_recipe(user=self.user, title='Thai green curry')
+        recipe_2 = sample_recipe(user=self.user, title='Pad thai')
+        recipe_3 = sample_recipe(user=self.user, title='Noodle soup')
+        recipe_3.tags.add(sample_tag(user=self.user, name='Curries'))
+        sample_recipe(user=self.user, title='Fish and chips')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        # Title matches rank above tag matches
+        self.assertEqual([recipe['id'] for recipe in res.data],
+                         [recipe_1.id, recipe_3.id])
+
+        res = self.client.get(RECIPES_URL, {'search': 'thai'})
+
+        self.assertEqual(sorted(recipe['id'] for recipe in res.data),
+                         [recipe_1.id, recipe_2.id])
+
+    def test_search_follows_renamed_ingredient(self):
+        """Test the search index is updated when an ingredient changes."""
+        ingredient = sample_ingredient(user=self.user, name='Tofu')
+        recipe = sample_recipe(user=self.user, title='Stir fry')
+        recipe.ingredients.add(ingredient)
+
+        ingredient.name = 'Tempeh'
+        ingredient.save()
+
+        res = self.client.get(RECIPES_URL, {'search': 'tempeh'})
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe.id])
+        res = self.client.get(RECIPES_URL, {'search': 'tofu'})
+        self.assertEqual(res.data, [])
+
+    def test_filter_recipes_invalid_match(self):
+        """Test that an unknown match mode is rejected."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class RecipeImageUploadTests(TestCase):
 
@@ -267,6 +380,23 @@ class RecipeImageUploadTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_upload_without_image(self):
+        """Test that an upload without a file is rejected as is."""
+        Recipe.objects.filter(pk=self.recipe.pk) \
+            .update(image_renditions=['thumbnail'])
+        url = image_upload_url(self.recipe.id)
+
+        with patch('recipe.views.renditions.enqueue') as enqueue:
+            for payload in ({}, {'image': ''}):
+                res = self.client.post(url, payload, format='multipart')
+
+                self.assertEqual(res.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+        enqueue.assert_not_called()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, ['thumbnail'])
+
     def test_filter_recipes_by_tags(self):
         """Test returning recipes with specific tags."""
         recipe_1 = sample_recipe(user=self.user, title='Thai vegetable curry')
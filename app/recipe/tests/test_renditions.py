@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe import renditions
+from recipe.serializers import RecipeSerializer
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+    """Return url for recipe image upload."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT,
+                   RECIPE_IMAGE_RENDITIONS={'thumbnail': 16, 'medium': 64},
+                   RECIPE_IMAGE_RENDITION_WORKERS=0)
+class RecipeRenditionTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5.)
+
+    def _upload(self, size=(100, 50)):
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            Image.new('RGBA', size).save(ntf, format='PNG')
+            ntf.seek(0)
+            return self.client.post(image_upload_url(self.recipe.id),
+                                    {'image': ntf}, format='multipart')
+
+    def test_rendition_name(self):
+        """Test that renditions are stored next to the original."""
+        name = renditions.rendition_name('uploads/recipe/abc.png', 'thumb')
+
+        self.assertEqual(name, 'uploads/recipe/renditions/abc_thumb.jpg')
+
+    @patch('recipe.renditions.enqueue')
+    def test_upload_enqueues_renditions(self, mock_enqueue):
+        """Test that uploading only schedules the resizing."""
+        self.recipe.image_renditions = ['thumbnail']
+        self.recipe.save()
+
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_renditions'], {})
+        mock_enqueue.assert_called_once()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, [])
+
+    @patch('recipe.renditions.enqueue')
+    def test_render_renditions(self, mock_enqueue):
+        """Test rendering resized copies of an uploaded image."""
+        self._upload(size=(100, 50))
+        self.recipe.refresh_from_db()
+
+        renditions.submit(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(sorted(self.recipe.image_renditions),
+                         ['medium', 'thumbnail'])
+        thumbnail = os.path.join(MEDIA_ROOT, renditions.rendition_name(
+            self.recipe.image.name, 'thumbnail'))
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (16, 8))
+
+        data = RecipeSerializer(self.recipe).data
+        self.assertTrue(
+            data['image_renditions']['thumbnail'].endswith('_thumbnail.jpg'))
+
+    @patch('recipe.renditions.enqueue')
+    def test_replaced_image_not_updated(self, mock_enqueue):
+        """Test that renditions of a replaced image aren't recorded."""
+        self._upload()
+        self.recipe.refresh_from_db()
+        old_name = self.recipe.image.name
+        # Other content, identical images are stored under the same name
+        self._upload(size=(60, 30))
+
+        renditions.submit(self.recipe.id, old_name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, [])
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.cache import list_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsTests(TestCase):
+    """Test selecting the fields and nested relations of recipes."""
+
+    def setUp(self):
+        list_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Tofu')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=30, price='7.00')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def test_list_fields(self):
+        """Test that only the requested columns are read and rendered."""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': self.recipe.id,
+                                     'title': 'Curry'}])
+        # The user's version and the recipes, without prefetches or
+        # unrequested columns
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn('"price"', context.captured_queries[1]['sql'])
+
+    def test_list_expand(self):
+        """Test nesting some relations of listed recipes."""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        self.assertEqual(res.data[0]['tags'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(res.data[0]['ingredients'], [self.ingredient.id])
+        self.assertEqual(len(context.captured_queries), 4)
+
+    def test_retrieve_fields_and_expand(self):
+        """Test that detail views nest only the expanded relations."""
+        url = detail_url(self.recipe.id)
+
+        res = self.client.get(url, {'fields': 'title,tags,ingredients',
+                                    'expand': 'ingredients'})
+
+        self.assertEqual(res.data, {
+            'title': 'Curry', 'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'name': 'Tofu'}],
+        })
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url, {'fields': 'title,tags',
+                                        'expand': ''})
+        self.assertEqual(res.data, {'title': 'Curry', 'tags': [self.tag.id]})
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_retrieve_default_nests_relations(self):
+        """Test that detail views still nest every relation by default."""
+        res = self.client.get(detail_url(self.recipe.id),
+                              {'fields': 'tags'})
+
+        self.assertEqual(res.data, {'tags': [{'id': self.tag.id,
+                                              'name': 'Vegan'}]})
+
+    def test_image_renditions_field(self):
+        """Test that renditions load the columns they're built from."""
+        res = self.client.get(RECIPES_URL, {'fields': 'image_renditions'})
+
+        self.assertEqual(res.data, [{'image_renditions': {}}])
+
+    @override_settings(FAST_LIST_SERIALIZATION=True)
+    def test_fast_list_fields(self):
+        """Test that the fast list path renders the same subset."""
+        res = self.client.get(RECIPES_URL, {'fields': 'price,tags'})
+
+        self.assertEqual(res.data, [{'tags': [self.tag.id],
+                                     'price': '7.00'}])
+
+    def test_empty_fields_ignored(self):
+        """Test that an empty ?fields= renders every field."""
+        for fields in ('', ' , '):
+            res = self.client.get(RECIPES_URL, {'fields': fields})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data[0]['title'], 'Curry')
+            self.assertIn('price', res.data[0])
+
+    def test_unknown_names(self):
+        """Test that unknown fields and relations are rejected."""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPES_URL, {'expand': 'user'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,155 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeStats, Tag
+
+
+STATS_URL = reverse('recipe:stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def stats_rows(user):
+    """Return the summaries of user, comparable between computations."""
+    return sorted(
+        (row.tag_id or 0, row.recipe_count, row.price_total, row.time_total,
+         tuple(row.time_buckets))
+        for row in RecipeStats.objects.filter(user=user)
+        if row.recipe_count)
+
+
+class RecipeStatsTests(TestCase):
+    """Test the incrementally maintained recipe summaries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dessert = Tag.objects.create(user=self.user, name='Dessert')
+
+    def create_recipe(self, **params):
+        defaults = {'title': 'Sample', 'time_minutes': 10, 'price': '5.00'}
+        defaults.update(params)
+        return Recipe.objects.create(user=self.user, **defaults)
+
+    def assertMatchesRebuild(self):
+        incremental = stats_rows(self.user)
+        RecipeStats.objects.rebuild([self.user.pk])
+        self.assertEqual(incremental, stats_rows(self.user))
+
+    def test_stats_endpoint(self):
+        """Test summarizing recipes overall and per tag."""
+        cake = self.create_recipe(title='Cake', time_minutes=90, price='8.00')
+        salad = self.create_recipe(title='Salad', time_minutes=10,
+                                   price='4.00')
+        cake.tags.add(self.vegan, self.dessert)
+        salad.tags.add(self.vegan)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_price'], '6.00')
+        self.assertEqual(res.data['average_time_minutes'], 50)
+        self.assertEqual([bucket['count'] for bucket in
+                          res.data['time_minutes']], [1, 0, 0, 1, 0])
+        self.assertEqual(res.data['time_minutes'][-1]['max'], None)
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Dessert', 1), ('Vegan', 2)])
+
+    def test_stats_empty(self):
+        """Test the summary of a user without recipes."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_stats_limited_to_user(self):
+        """Test that only the user's recipes are summarized."""
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass')
+        Recipe.objects.create(user=other, title='Soup', time_minutes=5,
+                              price='1.00')
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+
+    def test_stats_queries_independent_of_recipes(self):
+        """Test that the endpoint doesn't read the recipes."""
+        for i in range(20):
+            self.create_recipe().tags.add(self.vegan)
+
+        # Authentication and the summary rows
+        with self.assertNumQueries(1):
+            self.client.get(STATS_URL)
+
+    def test_incremental_updates(self):
+        """Test that every kind of write keeps the summaries exact."""
+        cake = self.create_recipe(time_minutes=45, price='7.50')
+        salad = self.create_recipe(time_minutes=5)
+        cake.tags.add(self.vegan, self.dessert)
+        salad.tags.set([self.vegan])
+        self.assertMatchesRebuild()
+
+        cake.price = '9.99'
+        cake.time_minutes = 200
+        cake.save()
+        cake.title = 'Renamed'
+        cake.save(update_fields=['title'])
+        self.assertMatchesRebuild()
+
+        cake.tags.remove(self.vegan)
+        self.dessert.recipe_set.add(salad)
+        self.assertMatchesRebuild()
+
+        self.vegan.recipe_set.clear()
+        salad.tags.clear()
+        self.assertMatchesRebuild()
+
+        cake.tags.add(self.vegan)
+        self.dessert.delete()
+        cake.delete()
+        self.assertMatchesRebuild()
+
+    def test_api_writes(self):
+        """Test summaries after creating and bulk writing recipes."""
+        self.client.post(RECIPES_URL, {
+            'title': 'Cake', 'time_minutes': 30, 'price': '3.00',
+            'tags': [self.vegan.id]})
+        self.client.post(reverse('recipe:recipe-bulk'), [
+            {'title': 'Pie', 'time_minutes': 60, 'price': '6.00',
+             'tags': [self.dessert.id]},
+            {'id': Recipe.objects.get().id, 'price': '4.00',
+             'tags': [self.dessert.id]},
+        ], format='json')
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_price'], '5.00')
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Dessert', 2)])
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command(self):
+        """Test that the command recomputes drifted summaries."""
+        self.create_recipe().tags.add(self.vegan)
+        expected = stats_rows(self.user)
+        RecipeStats.objects.filter(user=self.user).update(recipe_count=7)
+
+        call_command('rebuild_recipe_stats', user_ids=[self.user.pk],
+                     stdout=StringIO())
+
+        self.assertEqual(stats_rows(self.user), expected)
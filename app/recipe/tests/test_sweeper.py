@@ -0,0 +1,178 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+
+from recipe import sweeper
+from recipe.renditions import rendition_name
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+DAY = 24 * 60 * 60
+
+
+def write(name, content=b'data', age=2 * DAY):
+    """Store a file directly, modified age seconds ago."""
+    path = image_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return name
+
+
+def exists(name):
+    return os.path.exists(image_storage.path(name))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageSweeperTests(TestCase):
+    """Test deleting the images no recipe references."""
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Cake', time_minutes=5, price='1.00')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, recipe, content):
+        recipe.image.save('photo.jpg', ContentFile(content))
+        write(recipe.image.name, content)
+        return recipe.image.name
+
+    def test_sweep(self):
+        """Test that replaced, deleted and leftover files are removed."""
+        replaced = self.upload(self.recipe, b'first')
+        current = self.upload(self.recipe, b'second')
+        thumbnail = write(rendition_name(current, 'thumbnail'))
+        Recipe.objects.filter(pk=self.recipe.pk) \
+            .update(image_renditions=['thumbnail'])
+        stale = write(rendition_name(replaced, 'thumbnail'), b'12345')
+        legacy = write('uploads/recipe/4f1c.jpg', b'123')
+        partial = write('uploads/recipe/ab/abcd.png.1234.partial')
+
+        deleted = list(sweeper.sweep(grace=DAY))
+
+        self.assertEqual(deleted, [(4, 5 + 5 + 3 + 4)])
+        for name in (replaced, stale, legacy, partial):
+            self.assertFalse(exists(name), name)
+        self.assertTrue(exists(current))
+        self.assertTrue(exists(thumbnail))
+        self.assertEqual(list(ImageBlob.objects.values_list('name',
+                                                            flat=True)),
+                         [current])
+
+    def test_grace_period(self):
+        """Test that recent files, maybe not committed yet, are kept."""
+        recent = write('uploads/recipe/ab/new.png', age=60)
+
+        self.assertEqual(list(sweeper.sweep(grace=DAY)), [])
+        self.assertTrue(exists(recent))
+
+    def test_referenced_again_kept(self):
+        """Test that files counted as referenced since the scan are kept."""
+        orphan = write('uploads/recipe/ab/abcd.png')
+        other = write('uploads/recipe/ab/abce.png')
+        ImageBlob.objects.create(name=orphan, ref_count=1)
+
+        self.assertEqual(list(sweeper.sweep(grace=DAY, batch_size=1)),
+                         [(0, 0), (1, 4)])
+        self.assertTrue(exists(orphan))
+        self.assertFalse(exists(other))
+
+    def test_reused_file_gets_grace_period(self):
+        """Test that storing an orphan's content again refreshes it."""
+        name = self.upload(self.recipe, b'photo')
+        self.recipe.image = None
+        self.recipe.save()
+
+        other = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=5, price='1.00')
+        # Not committed yet when the sweeper reads the recipes
+        image_storage.save('uploads/recipe/photo.jpg', ContentFile(b'photo'))
+
+        self.assertEqual(list(sweeper.sweep(grace=DAY)), [])
+        other.image = name
+        other.save()
+        self.assertTrue(exists(name))
+
+    def test_touched_since_found_kept(self):
+        """Test that files reused after the scan are kept."""
+        name = write('uploads/recipe/ab/abcd.png', age=60)
+
+        with patch.object(sweeper, 'find_orphans',
+                          return_value=[(name, 4)]):
+            self.assertEqual(list(sweeper.sweep(grace=DAY)), [(0, 0)])
+        self.assertTrue(exists(name))
+
+    def test_command(self):
+        """Test the command's dry run and report."""
+        orphan = write('uploads/recipe/ab/abcd.png', b'12')
+        out = StringIO()
+
+        call_command('sweep_images', dry_run=True, stdout=out)
+        self.assertTrue(exists(orphan))
+        self.assertIn('Would delete 1 orphaned files, reclaiming 2 bytes',
+                      out.getvalue())
+
+        call_command('sweep_images', stdout=out)
+        self.assertFalse(exists(orphan))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ConcurrentUploadTests(TransactionTestCase):
+    """Test sweeping while an upload reuses an orphaned file."""
+
+    def tearDown(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_upload_not_committed_yet(self):
+        """Test that the sweeper waits for the upload's reference."""
+        digest = hashlib.sha256(b'data').hexdigest()
+        name = write(f'uploads/recipe/{digest[:2]}/{digest}.png')
+        saved, counted = threading.Event(), threading.Event()
+
+        def upload():
+            with transaction.atomic():
+                self.assertEqual(image_storage.save(
+                    'uploads/recipe/photo.png', ContentFile(b'data')), name)
+                # As if the sweeper checked the age before the save
+                write(name)
+                saved.set()
+                counted.wait(10)
+                ImageBlob.objects.record([name])
+            connection.close()
+
+        thread = threading.Thread(target=upload)
+        thread.start()
+        saved.wait(10)
+        threading.Timer(0.2, counted.set).start()
+        try:
+            self.assertEqual(list(sweeper.sweep(grace=DAY)), [(0, 0)])
+        finally:
+            counted.set()
+            thread.join()
+
+        self.assertTrue(exists(name))
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
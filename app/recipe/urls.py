@@ -14,4 +14,5 @@ app_name = 'recipe'
 urlpatterns = [
     # All urls generated by DefaultRouter are added
     path('', include(router.urls)),
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
 ]
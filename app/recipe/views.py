@@ -1,23 +1,62 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from recipe import renditions, serializers
+from recipe.bulk import BulkRecipeWriter
+from recipe.cache import list_cache
+from recipe.conditional import has_preconditions, make_etag, \
+    not_modified, set_validators
+from recipe.export import stream_archive
+from recipe.fastpath import FastListMixin
+from recipe.metrics import image_upload_size
+from recipe.pagination import KeysetPagination
+from user.authentication import CachedTokenAuthentication
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(FastListMixin, viewsets.GenericViewSet,
                             mixins.ListModelMixin, mixins.CreateModelMixin):
     """Base viewset for user-owned recipe attributes."""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # Ends in a unique field, so it can be used as a pagination key
+    ordering = ('-name', 'id')
+    # Most suggestions returned by a single autocomplete request
+    autocomplete_max_limit = 50
 
     def get_queryset(self):
         """Return objects for current authenticated user only."""
         # Custom filtering of queryset
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        return self.queryset.filter(user=self.request.user) \
+            .order_by(*self.ordering)
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Return the most used objects whose name starts with ?prefix=."""
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            raise ValidationError(
+                {'prefix': [_('This query parameter is required.')]})
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise ValidationError(
+                {'limit': [_('A valid integer is required.')]})
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+
+        # Plain rows, typing latency leaves no room for serializers
+        matches = self.queryset.filter(user=request.user) \
+            .autocomplete(prefix, limit).values('id', 'name')
+        return Response(list(matches))
 
     def perform_create(self, serializer):
         """Create new attribute."""
@@ -38,34 +77,199 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(FastListMixin, viewsets.ModelViewSet):
     """Manage recipes in the database."""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    # Largest number of recipes accepted by a single bulk request
+    bulk_max_items = 1000
 
     def _params_to_ints(self, querystring):
         """Convert list of string ids to list of integers."""
         return [int(id) for id in querystring.split(',')]
 
+    def _match_all(self):
+        """Return whether the match query param asks for all ids."""
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('all', 'any'):
+            raise ValidationError(
+                {'match': _('Must be either "all" or "any".')})
+        return match == 'all'
+
+    def _param_names(self, param):
+        """Return the set of names in a comma separated query param."""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        return frozenset(name.strip() for name in value.split(',')
+                         if name.strip())
+
+    def get_serializer_fields(self):
+        """Return the fields asked for with ?fields=, None for all."""
+        fields = self._param_names('fields')
+        # An empty ?fields= is taken as absent, not as empty objects
+        if not fields or self.action not in ('list', 'retrieve'):
+            return None
+        unknown = fields - set(self.get_serializer_class().Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': [
+                _('Unknown fields: {names}.')
+                .format(names=', '.join(sorted(unknown)))]})
+        return fields
+
+    def get_expanded_fields(self):
+        """Return the relations to nest, from ?expand= or the action."""
+        expand = self._param_names('expand')
+        if expand is None:
+            # Detail views nest every relation, lists none
+            return frozenset(serializers.RecipeSerializer.expandable_fields) \
+                if self.action == 'retrieve' else frozenset()
+        unknown = expand - set(serializers.RecipeSerializer.expandable_fields)
+        if unknown:
+            raise ValidationError({'expand': [
+                _('Unknown relations: {names}.')
+                .format(names=', '.join(sorted(unknown)))]})
+        return expand
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
         # Dictionary of query params provided in get request;
         # None if not provided
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        # Whether recipes need all the given ids, or just any of them
+        match_all = self._match_all()
 
         queryset = self.queryset
+        # Filtering on the denormalized id arrays doesn't join the m2m
+        # tables, so every recipe is returned once
         if tags:
             tag_ids = self._params_to_ints(tags)
-            # Django syntax for filtering on foreign key objects
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter_tags(tag_ids, match_all)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.filter_ingredients(ingredient_ids, match_all)
+
+        search = self.request.query_params.get('search')
+        if search:
+            # Served by the GIN index on the maintained search vector
+            queryset = queryset.search(search)
+
+        queryset = queryset.filter(user=self.request.user) \
+            .order_by(*self.get_ordering())
+
+        # Only load the relations and columns the serializer for this
+        # action renders, so the number of queries doesn't grow with the
+        # number of recipes and the rows carry what is asked for
+        if self.action in ('list', 'retrieve'):
+            fields = self.get_serializer_fields()
+            expand = self.get_expanded_fields()
+            related = [field for field in Recipe.related_id_fields
+                       if fields is None or field in fields]
+            queryset = queryset \
+                .with_related([field for field in related
+                               if field in expand]) \
+                .with_related_ids([field for field in related
+                                   if field not in expand])
+            if fields is not None:
+                queryset = queryset.only(*self._columns(fields))
+
+        return queryset
+
+    @staticmethod
+    def _columns(fields):
+        """Return the recipe columns needed to render fields."""
+        # The version of the recipe is sent along, see retrieve
+        columns = {'id', 'updated_at'}
+        for field in fields:
+            if field == 'image_renditions':
+                columns.update(('image', 'image_renditions'))
+            elif field not in Recipe.related_id_fields:
+                columns.add(field)
+        return columns
+
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer, pruned and expanded for reads."""
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'] = self.get_serializer_fields()
+            kwargs['expand'] = self.get_expanded_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_row_mapper(self):
+        # Nested relations aren't read from the rows
+        if self.get_expanded_fields():
+            return None
+        return super().get_row_mapper()
+
+    def _etag(self, request, *state):
+        """Return the ETag of the requested representation in state."""
+        return make_etag(self.action, request.user.pk,
+                         list_cache.normalize(request.query_params),
+                         request.accepted_renderer.format, *state)
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, answering repeated requests from the cache."""
+        # Every write to the user's recipes bumps the version as it
+        # commits; read before the page, so a concurrent write only makes
+        # the ETag older than the page, never newer
+        version, changed_at = list_cache.version(request.user.pk)
+        key = list_cache.key(request.user.pk, request.query_params, version)
+        cached = list_cache.get(key)
+        etag = self._etag(request, version)
+        # The version changes when its transaction commits, which may be
+        # after changed_at, so lists are only checked against ETags, not
+        # If-Modified-Since
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-        return queryset.filter(user=self.request.user)
+        if cached is not None:
+            data, headers = cached
+            response = Response(data, headers=headers)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            # Keep the pagination links along with the page
+            headers = {'Link': response['Link']} \
+                if response.has_header('Link') else {}
+            list_cache.set(key, list(response.data), headers)
+
+        return set_validators(response, etag, changed_at)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe, or 304 when the client's copy is current."""
+        if has_preconditions(request):
+            # Checked against the version alone, without the relations
+            try:
+                last_modified = Recipe.objects \
+                    .filter(user=request.user, pk=int(kwargs['pk'])) \
+                    .values_list('updated_at', flat=True).first()
+            except ValueError:
+                last_modified = None
+            if last_modified is not None:
+                response = not_modified(
+                    request, self._etag(request, kwargs['pk'],
+                                        last_modified),
+                    last_modified)
+                if response is not None:
+                    return response
+
+        recipe = self.get_object()
+        response = Response(self.get_serializer(recipe).data)
+        return set_validators(
+            response, self._etag(request, str(recipe.pk), recipe.updated_at),
+            recipe.updated_at)
+
+    def get_ordering(self):
+        """Return the ordering of the recipes, best matches first."""
+        if self.request.query_params.get('search'):
+            return ('-rank', '-id')
+        return self.ordering
 
     def get_serializer_class(self):
         """Return appropriate serializer class."""
@@ -74,6 +278,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk':
+            return serializers.RecipeBulkItemSerializer
         # Otherwise just return default serializer
         return self.serializer_class
 
@@ -91,8 +297,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            # Just use save-function because we have a model-serializer
-            serializer.save()
+            # Required, so renditions are only reset for a new image
+            image_upload_size.observe(
+                serializer.validated_data['image'].size)
+            # Just use save-function because we have a model-serializer,
+            # renditions of the previous image don't apply anymore; the
+            # stored file stays locked until its reference is counted
+            with transaction.atomic():
+                recipe = serializer.save(image_renditions=[])
+            # Resizing happens in worker processes after the response
+            renditions.enqueue(recipe)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -100,3 +314,60 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # errors is auto-generated if serializer not valid
         return Response(serializer.errors,
                         status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create or update a batch of recipes in one request."""
+        # Items with an id update that recipe, others create a new one
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError(
+                {'non_field_errors': [_('Expected a list of recipes.')]})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [
+                _('At most {count} recipes can be sent at once.')
+                .format(count=self.bulk_max_items)]})
+
+        # By default nothing is saved unless every item is valid,
+        # with atomic=false the valid items are saved regardless
+        atomic = request.query_params.get('atomic', 'true') != 'false'
+
+        writer = BulkRecipeWriter(request.user, items)
+        if not writer.validate() and atomic:
+            return Response(writer.results, status.HTTP_400_BAD_REQUEST)
+
+        return Response(writer.save(), status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Download an archive of the user's recipes and images."""
+        # Built while it is sent, so large accounts don't fill up memory
+        response = StreamingHttpResponse(
+            stream_archive(request.user),
+            content_type='application/zip')
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.zip"'
+        return response
+
+
+class RecipeStatsView(APIView):
+    """Summarize the recipes of the user, overall and per tag."""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        # One maintained row per tag, whatever the number of recipes
+        rows = RecipeStats.objects \
+            .filter(user=request.user, recipe_count__gt=0) \
+            .select_related('tag').order_by('tag__name', 'tag_id')
+        totals = RecipeStats(user=request.user)
+        tags = []
+        for row in rows:
+            if row.tag_id is None:
+                totals = row
+            else:
+                tags.append(row)
+
+        data = serializers.RecipeStatsSerializer(totals).data
+        data['tags'] = serializers.TagStatsSerializer(tags, many=True).data
+        return Response(data)
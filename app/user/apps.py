@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = 'user'
+
+    def ready(self):
+        # Connect the token cache invalidation handlers
+        from user import signals  # noqa: F401
+        # Register the collectors of the caches in the metrics
+        from user import metrics  # noqa: F401
@@ -0,0 +1,95 @@
+import copy
+import hashlib
+import threading
+
+from django.conf import settings
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import get_cache_backend
+
+
+class TokenCache:
+    """Cache of authenticated (user, token) pairs by token key.
+
+    Entries live in a bounded in-process LRU, or in a Django cache when
+    a cache alias is configured so all worker processes share (and
+    invalidate) the same entries. In-process entries are only
+    invalidated in their own process, the others drop them after ttl
+    seconds, so keep it short.
+    """
+
+    def __init__(self, max_size=10000, ttl=10, cache_alias=None):
+        self.ttl = ttl
+        self.backend = get_cache_backend(max_size, ttl, cache_alias)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Create a token cache configured by settings.AUTH_TOKEN_CACHE."""
+        return cls(**{key.lower(): value for key, value in
+                      getattr(settings, 'AUTH_TOKEN_CACHE', {}).items()})
+
+    @staticmethod
+    def _cache_key(key):
+        # Never keep raw token keys around in a (shared) cache
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached (user, token) pair for key, or None."""
+        entry = self.backend.get(self._cache_key(key))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, user, token):
+        """Cache the (user, token) pair authenticated by key."""
+        self.backend.set(self._cache_key(key), (user, token), self.ttl)
+
+    def delete(self, key):
+        """Forget the pair cached for key."""
+        self.backend.delete(self._cache_key(key))
+
+    def delete_for_user(self, user_id):
+        """Forget the pairs cached for all tokens of a user."""
+        keys = Token.objects.filter(user_id=user_id) \
+            .values_list('key', flat=True)
+        for key in keys:
+            self.delete(key)
+
+    def clear(self):
+        """Forget every cached pair and reset the counters."""
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+token_cache = TokenCache.from_settings()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication resolving tokens from a cache.
+
+    Skips the token/user query on every request but the first one for
+    each token in each TTL, entries are invalidated by the signal
+    handlers in user.signals when a token is deleted or its user
+    changes.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            # Raises AuthenticationFailed for unknown keys or inactive users
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = entry
+
+        # Don't share the cached instances between concurrent requests
+        return copy.copy(user), token
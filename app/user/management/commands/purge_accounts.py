@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from user import purge
+
+
+class Command(BaseCommand):
+    """Django command purging deleted accounts"""
+    help = ('Delete the accounts whose deletion was requested, and all of '
+            'their data, chunk by chunk. Finishes purges interrupted by a '
+            'restart, so meant to run periodically, e.g. from cron; given '
+            'users are disabled first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='user_ids', metavar='USER_ID',
+                            help='Disable and purge this user, repeatable.')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows deleted per transaction.')
+
+    def handle(self, *args, **options):
+        """Purge the accounts one after the other"""
+        users = get_user_model().objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        else:
+            users = users.filter(deletion_requested_at__isnull=False)
+
+        start = time.perf_counter()
+        purged = 0
+        for user in users:
+            if user.deletion_requested_at is None:
+                purge.disable(user)
+            totals = {}
+            for name, deleted in purge.purge(user.pk, options['chunk_size']):
+                totals[name] = totals.get(name, 0) + deleted
+                self.stdout.write(
+                    f'User {user.pk}: {totals[name]} {name} deleted')
+            purged += totals.get('users', 0)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} accounts in '
+            f'{time.perf_counter() - start:.1f} s'))
@@ -0,0 +1,20 @@
+from core.metrics import registry
+from user.authentication import token_cache
+from user.throttling import buckets
+
+
+@registry.collector('auth_token_cache_requests_total',
+                    'Token cache lookups, by result.', ('result',))
+def token_cache_requests():
+    return {('hit',): token_cache.hits, ('miss',): token_cache.misses}
+
+
+@registry.collector('throttle_requests_total',
+                    'Throttled requests, by scope and result.',
+                    ('scope', 'result'))
+def throttle_requests():
+    counts = {(scope, 'allowed'): count
+              for scope, count in buckets.allowed.items()}
+    counts.update(((scope, 'rejected'), count)
+                  for scope, count in buckets.rejected.items())
+    return counts
@@ -0,0 +1,159 @@
+import functools
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag, Ingredient, ImageBlob, Recipe, RecipeStats, \
+    RecipeVersion
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_chunk_size():
+    return getattr(settings, 'ACCOUNT_PURGE', {}).get('CHUNK_SIZE', 1000)
+
+
+def disable(user):
+    """Disable the account of user and mark it to be purged."""
+    user.is_active = False
+    user.deletion_requested_at = timezone.now()
+    # Saving drops the cached authentications of the user; processes
+    # with their own token cache drop them within its TTL
+    user.save(update_fields=['is_active', 'deletion_requested_at'])
+    Token.objects.filter(user=user).delete()
+
+
+def request_deletion(user):
+    """Disable the user, and purge them once the transaction commits."""
+    disable(user)
+    purge_on_commit(user.pk)
+
+
+def _delete(model, ids):
+    """Delete the rows of model with ids, without collecting them."""
+    # The signals of model keep derived data in sync one row at a time,
+    # the purge maintains it for whole chunks instead
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name(model._meta.pk.column)} '
+            f'= ANY(%s)', [list(ids)])
+
+
+def _purge_recipes(user_id, chunk_size):
+    """Delete a chunk of the user's recipes, return how many."""
+    # Concurrent purges of the user lock and delete distinct chunks, so
+    # each image reference is released once
+    rows = list(Recipe.objects.filter(user_id=user_id).order_by('pk')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'image', 'tag_ids', 'ingredient_ids')
+                [:chunk_size])
+    if not rows:
+        return 0
+
+    ids = [row[0] for row in rows]
+    ImageBlob.objects.record([row[1] for row in rows], -1)
+    Recipe.tags.through.objects.filter(recipe_id__in=ids).delete()
+    Recipe.ingredients.through.objects.filter(recipe_id__in=ids).delete()
+    _delete(Recipe, ids)
+
+    # Tags and ingredients of other users the recipes were linked to;
+    # the user's own are deleted next
+    for model, related_ids in ((Tag, {pk for row in rows for pk in row[2]}),
+                               (Ingredient,
+                                {pk for row in rows for pk in row[3]})):
+        if related_ids:
+            model.objects.filter(pk__in=related_ids) \
+                .exclude(user_id=user_id).refresh_usage()
+    return len(ids)
+
+
+def _purge_related(model, user_id, chunk_size):
+    """Delete a chunk of the user's tags or ingredients, return how many."""
+    ids = list(model.objects.filter(user_id=user_id).order_by('pk')
+               .select_for_update(skip_locked=True)
+               .values_list('pk', flat=True)[:chunk_size])
+    if not ids:
+        return 0
+
+    column = f'{model._meta.model_name}_id__in'
+    links = model.recipe_set.through.objects.filter(**{column: ids})
+    # Recipes of other users linked to them
+    recipe_ids = list(links.values_list('recipe_id', flat=True).distinct())
+    links.delete()
+    if model is Tag:
+        RecipeStats.objects.filter(tag_id__in=ids).delete()
+    _delete(model, ids)
+
+    if recipe_ids:
+        recipes = Recipe.objects.filter(pk__in=recipe_ids)
+        recipes.refresh_related()
+        # Their owners' cached lists are stale, see recipe.cache
+        for owner_id in recipes.values_list('user_id', flat=True) \
+                .distinct().order_by('user_id'):
+            RecipeVersion.objects.bump(owner_id)
+    return len(ids)
+
+
+def purge(user_id, chunk_size=None):
+    """Delete a user and all of their data, chunk by chunk.
+
+    Yields the name and number of the rows deleted by each chunk. Chunks
+    are deleted by a few set based statements in their own transaction,
+    so locks are held briefly and memory doesn't grow with the account;
+    an interrupted purge continues where it stopped when run again, see
+    the purge_accounts command. Rows locked by a concurrent purge of the
+    user are left to it. The user should be disabled first.
+
+    Raises TransactionManagementError in an atomic block, where the
+    chunks would only be savepoints holding every lock until it ends.
+    """
+    if connection.in_atomic_block:
+        raise TransactionManagementError(
+            'Purges must not run in an atomic block, see purge_on_commit.')
+    chunk_size = chunk_size or get_chunk_size()
+    steps = (('recipes', Recipe, _purge_recipes),
+             ('tags', Tag, functools.partial(_purge_related, Tag)),
+             ('ingredients', Ingredient,
+              functools.partial(_purge_related, Ingredient)))
+
+    for name, model, purge_chunk in steps:
+        while True:
+            with transaction.atomic():
+                deleted = purge_chunk(user_id, chunk_size)
+            if not deleted:
+                break
+            yield name, deleted
+        # Rows left are locked by a concurrent purge, which finishes
+        if model.objects.filter(user_id=user_id).exists():
+            return
+
+    # Only a few rows are left, e.g. the user's summary and tokens
+    User = get_user_model()
+    with transaction.atomic():
+        _, counts = User.objects.filter(pk=user_id).delete()
+    yield 'users', counts.get(User._meta.label, 0)
+
+
+def purge_on_commit(user_id):
+    """Purge the user once the current transaction commits.
+
+    Runs in the committing thread, right away outside of an atomic
+    block. Purges that fail or are interrupted by a restart are finished
+    by the purge_accounts command.
+    """
+    def run():
+        try:
+            for name, deleted in purge(user_id):
+                logger.info('Purged %d %s of user %d', deleted, name, user_id)
+        except Exception:
+            logger.exception('Purging user %d failed', user_id)
+
+    transaction.on_commit(run)
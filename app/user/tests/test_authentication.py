@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='testpass', name='Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_cached(self):
+        """Test that a known token is only looked up once."""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.hits, 1)
+
+    def test_invalid_token_not_cached(self):
+        """Test that unknown tokens are rejected every time."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        for _ in range(2):
+            res = self.client.get(ME_URL)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test that a deleted token stops authenticating."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test that tokens of a deactivated user stop authenticating."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch('core.cache.time.monotonic')
+    def test_other_process_entries_expire(self, monotonic):
+        """Test that another process's entry outlives a change by the TTL."""
+        monotonic.return_value = 1000.
+        key = self.token.key
+        other_process = TokenCache()
+        other_process.set(key, self.user, self.token)
+        self.token.delete()
+
+        monotonic.return_value = 1000. + other_process.ttl - 1
+        self.assertIsNotNone(other_process.get(key))
+        monotonic.return_value = 1000. + other_process.ttl
+        self.assertIsNone(other_process.get(key))
+        self.assertLessEqual(other_process.ttl, 10)
+
+    def test_updated_user_invalidated(self):
+        """Test that profile updates are visible on the next request."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New name')
@@ -0,0 +1,167 @@
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag, Ingredient, ImageBlob, Recipe, RecipeStats, \
+    RecipeVersion
+
+from user import purge
+
+
+def create_user(email):
+    return get_user_model().objects.create_user(email, 'testpass')
+
+
+def create_account(user, recipes):
+    """Give user a tag, an ingredient and recipes linked to them."""
+    tag = Tag.objects.create(user=user, name='Vegan')
+    ingredient = Ingredient.objects.create(user=user, name='Tofu')
+    for i in range(recipes):
+        recipe = Recipe.objects.create(user=user, title=f'Recipe {i}',
+                                       time_minutes=5, price='1.00')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+    return tag, ingredient
+
+
+class PurgeTests(TransactionTestCase):
+    """Test purging accounts chunk by chunk."""
+
+    def setUp(self):
+        self.user = create_user('test@londonappdev.com')
+        self.other = create_user('other@londonappdev.com')
+
+    def test_purge(self):
+        """Test that all of the user's data is deleted, in chunks."""
+        tag, ingredient = create_account(self.user, 5)
+        Recipe.objects.filter(user=self.user).update(image='shared.jpg')
+        # Updates skip the signals counting references
+        ImageBlob.objects.record(['shared.jpg'] * 5)
+        other_tag, _ = create_account(self.other, 1)
+        other_recipe = Recipe.objects.get(user=self.other)
+        other_recipe.tags.add(tag)
+        other_recipe.image = 'shared.jpg'
+        other_recipe.save()
+        Recipe.objects.filter(user=self.user).first().tags.add(other_tag)
+        version, _ = RecipeVersion.objects.current(self.other.pk)
+
+        progress = list(purge.purge(self.user.pk, chunk_size=2))
+
+        self.assertEqual(progress, [
+            ('recipes', 2), ('recipes', 2), ('recipes', 1), ('tags', 1),
+            ('ingredients', 1), ('users', 1)])
+        self.assertFalse(get_user_model().objects.filter(
+            pk=self.user.pk).exists())
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+        self.assertFalse(RecipeStats.objects.filter(user=self.user).exists())
+        # Derived data of the other user follows
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.tag_ids, [other_tag.pk])
+        self.assertGreater(RecipeVersion.objects.current(self.other.pk)[0],
+                           version)
+        other_tag.refresh_from_db()
+        self.assertEqual(other_tag.usage, 1)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+    def test_queries_independent_of_size(self):
+        """Test that a chunk runs the same statements for any size."""
+        create_account(self.user, 3)
+        create_account(self.other, 30)
+
+        counts = []
+        for user in (self.user, self.other):
+            with CaptureQueriesContext(connection) as context:
+                list(purge.purge(user.pk, chunk_size=100))
+            counts.append(len(context.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_model_delete(self):
+        """Test that deleting a user purges them once committed."""
+        create_account(self.user, 3)
+        Token.objects.create(user=self.user)
+
+        with transaction.atomic():
+            self.assertEqual(self.user.delete(), (0, {}))
+
+            self.user.refresh_from_db()
+            self.assertFalse(self.user.is_active)
+            self.assertFalse(Token.objects.exists())
+            self.assertEqual(Recipe.objects.count(), 3)
+
+        self.assertEqual(list(get_user_model().objects.all()), [self.other])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_purge_in_atomic_block(self):
+        """Test that purges refuse to hold their locks in a transaction."""
+        create_account(self.user, 1)
+
+        with transaction.atomic():
+            with self.assertRaises(TransactionManagementError):
+                list(purge.purge(self.user.pk))
+
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_command(self):
+        """Test purging requested deletions and given users."""
+        purge.disable(self.user)
+        create_account(self.other, 1)
+        out = StringIO()
+
+        call_command('purge_accounts', stdout=out)
+        self.assertEqual(list(get_user_model().objects.all()), [self.other])
+        self.assertIn('Purged 1 accounts', out.getvalue())
+
+        call_command('purge_accounts', user_ids=[self.other.pk],
+                     chunk_size=10, stdout=out)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ConcurrentPurgeTests(TransactionTestCase):
+    """Test purging a user in two processes at once."""
+
+    def test_locked_chunks_skipped(self):
+        """Test that recipes deleted by another purge are left to it."""
+        user = create_user('test@londonappdev.com')
+        create_account(user, 3)
+        Recipe.objects.filter(user=user).update(image='shared.jpg')
+        ImageBlob.objects.record(['shared.jpg'] * 4)
+        locked = Recipe.objects.filter(user=user).earliest('pk')
+        started, release = threading.Event(), threading.Event()
+
+        def purging():
+            with transaction.atomic():
+                Recipe.objects.select_for_update().get(pk=locked.pk)
+                started.set()
+                release.wait(10)
+            connection.close()
+
+        thread = threading.Thread(target=purging)
+        thread.start()
+        started.wait(10)
+        try:
+            progress = list(purge.purge(user.pk, chunk_size=10))
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(progress, [('recipes', 2)])
+        self.assertEqual(list(Recipe.objects.all()), [locked])
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+
+        # The other purge committed without deleting, a later run finishes
+        self.assertEqual(list(purge.purge(user.pk))[0], ('recipes', 1))
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
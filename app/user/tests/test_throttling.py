@@ -0,0 +1,131 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.throttling import buckets, parse_rate, TokenBuckets
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+
+RATES = {'login_ip': '5/min', 'login_email': '2/min', 'signup_ip': '1/min'}
+
+
+class TokenBucketsTests(TestCase):
+    """Test the token buckets."""
+
+    def test_parse_rate(self):
+        """Test that rates are parsed into requests and seconds."""
+        self.assertEqual(parse_rate('10/min'), (10, 60))
+        self.assertEqual(parse_rate('3/s'), (3, 1))
+        self.assertIsNone(parse_rate(None))
+
+    @patch('user.throttling.time.time')
+    def test_bucket_refills(self, time):
+        """Test that a bucket lets a burst through, then refills."""
+        store = TokenBuckets()
+        time.return_value = 1000.
+
+        self.assertIsNone(store.consume('scope', 'a', (2, 60)))
+        self.assertIsNone(store.consume('scope', 'a', (2, 60)))
+        self.assertAlmostEqual(store.consume('scope', 'a', (2, 60)), 30)
+        # Other keys have their own bucket
+        self.assertIsNone(store.consume('scope', 'b', (2, 60)))
+
+        time.return_value = 1030.
+        self.assertIsNone(store.consume('scope', 'a', (2, 60)))
+        self.assertEqual(store.allowed['scope'], 4)
+        self.assertEqual(store.rejected['scope'], 1)
+
+
+@override_settings(LOGIN_THROTTLES={'RATES': RATES})
+class LoginThrottleTests(TestCase):
+    """Test throttling the views that hash passwords."""
+
+    def setUp(self):
+        buckets.clear()
+        self.addCleanup(buckets.clear)
+        self.client = APIClient()
+        get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='testpass')
+
+    def _login(self, email='test@londonappdev.com', ip='10.0.0.1',
+               **extra):
+        return self.client.post(
+            TOKEN_URL, {'email': email, 'password': 'wrong'},
+            REMOTE_ADDR=ip, **extra)
+
+    def test_login_throttled_per_email(self):
+        """Test that an email is throttled before hashing passwords."""
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            res = self._login(email='TEST@londonappdev.com ', ip=ip)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('user.serializers.authenticate') as authenticate:
+            res = self._login(ip='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        authenticate.assert_not_called()
+        self.assertEqual(buckets.rejected['login_email'], 1)
+
+        # Other emails are still let through
+        res = self._login(email='other@londonappdev.com', ip='10.0.0.3')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_throttled_per_ip(self):
+        """Test that an address is throttled across emails."""
+        for i in range(5):
+            self._login(email=f'user{i}@londonappdev.com')
+
+        res = self._login(email='new@londonappdev.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(buckets.rejected['login_ip'], 1)
+        res = self._login(email='new@londonappdev.com', ip='10.0.0.2')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_spoofed_forwarded_for_ignored(self):
+        """Test that clients can't pick the address they're throttled by."""
+        for i in range(5):
+            self._login(email=f'user{i}@londonappdev.com',
+                        HTTP_X_FORWARDED_FOR=f'192.0.2.{i}')
+
+        res = self._login(email='new@londonappdev.com',
+                          HTTP_X_FORWARDED_FOR='192.0.2.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(LOGIN_THROTTLES={'RATES': RATES, 'NUM_PROXIES': 1})
+    def test_address_appended_by_proxy(self):
+        """Test throttling the address the trusted proxy forwarded."""
+        for i in range(5):
+            self._login(email=f'user{i}@londonappdev.com',
+                        HTTP_X_FORWARDED_FOR=f'192.0.2.{i}, 198.51.100.1')
+
+        res = self._login(email='new@londonappdev.com',
+                          HTTP_X_FORWARDED_FOR='192.0.2.9, 198.51.100.1')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self._login(email='new@londonappdev.com',
+                          HTTP_X_FORWARDED_FOR='198.51.100.2')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_signup_throttled_per_ip(self):
+        """Test that signups are throttled per address."""
+        payload = {'email': 'new@londonappdev.com', 'password': 'testpass',
+                   'name': 'New'}
+        res = self.client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        payload['email'] = 'newer@londonappdev.com'
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(get_user_model().objects.filter(
+            email='newer@londonappdev.com').exists())
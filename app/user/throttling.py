@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from rest_framework.throttling import BaseThrottle
+
+from core.cache import get_cache_backend
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Return (requests, seconds) of a '<requests>/<period>' rate."""
+    if rate is None:
+        return None
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+class TokenBuckets:
+    """Token buckets of the throttled clients, by scope and key.
+
+    A bucket holds up to the number of requests of its rate, and is
+    refilled continuously over the period of the rate. Buckets live in a
+    bounded in-process LRU, or in a Django cache when a cache alias is
+    configured so all worker processes share them; updates to a shared
+    bucket aren't atomic, so concurrent requests may slightly exceed it.
+    """
+
+    def __init__(self, max_size=100000, cache_alias=None):
+        self.backend = get_cache_backend(max_size, None, cache_alias)
+        self._lock = threading.Lock()
+        # Requests let through and rejected, by scope
+        self.allowed = Counter()
+        self.rejected = Counter()
+
+    @classmethod
+    def from_settings(cls):
+        """Create buckets configured by settings.LOGIN_THROTTLES."""
+        config = getattr(settings, 'LOGIN_THROTTLES', {})
+        return cls(max_size=config.get('MAX_SIZE', 100000),
+                   cache_alias=config.get('CACHE_ALIAS'))
+
+    @staticmethod
+    def _cache_key(scope, ident):
+        # Don't keep addresses and emails around in a (shared) cache
+        return f'throttle:{scope}:' + \
+            hashlib.sha256(ident.encode()).hexdigest()
+
+    def consume(self, scope, ident, rate):
+        """Take a token from a bucket.
+
+        Return None if the request is allowed, otherwise the number of
+        seconds until the bucket holds a token again.
+        """
+        capacity, period = rate
+        refill = capacity / period
+        key = self._cache_key(scope, ident)
+        # Wall clock time, buckets may be shared between hosts
+        now = time.time()
+
+        with self._lock:
+            tokens, updated = self.backend.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            if tokens < 1:
+                self.rejected[scope] += 1
+                return (1 - tokens) / refill
+
+            # A bucket untouched for a period is full, like a missing one
+            self.backend.set(key, (tokens - 1, now), period)
+            self.allowed[scope] += 1
+            return None
+
+    def clear(self):
+        """Empty every bucket and reset the counters."""
+        self.backend.clear()
+        with self._lock:
+            self.allowed.clear()
+            self.rejected.clear()
+
+
+buckets = TokenBuckets.from_settings()
+
+
+class BucketThrottle(BaseThrottle):
+    """Throttle requests with the token bucket of their client.
+
+    Runs before the view parses credentials, so rejected requests never
+    reach the password hasher. The rate of each scope is read from
+    settings.LOGIN_THROTTLES['RATES'], scopes without one aren't
+    throttled.
+    """
+    scope = None
+
+    def get_ident_for(self, request):
+        """Return the key of the request's bucket, or None to skip."""
+        raise NotImplementedError('.get_ident_for() must be overridden')
+
+    def allow_request(self, request, view):
+        rates = getattr(settings, 'LOGIN_THROTTLES', {}).get('RATES', {})
+        rate = parse_rate(rates.get(self.scope))
+        ident = self.get_ident_for(request)
+        if rate is None or ident is None:
+            return True
+
+        self.wait_time = buckets.consume(self.scope, ident, rate)
+        return self.wait_time is None
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPThrottle(BucketThrottle):
+    """Throttle requests per client IP address.
+
+    The address is REMOTE_ADDR, or behind settings.LOGIN_THROTTLES[
+    'NUM_PROXIES'] reverse proxies the one the outermost proxy appended
+    to X-Forwarded-For. Clients can send any X-Forwarded-For, so
+    addresses they put in front of those are never trusted.
+    """
+
+    def get_ident_for(self, request):
+        num_proxies = getattr(settings, 'LOGIN_THROTTLES', {}) \
+            .get('NUM_PROXIES', 0)
+        if num_proxies:
+            forwarded = [address.strip() for address in request.META.get(
+                'HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()]
+            if len(forwarded) >= num_proxies:
+                return forwarded[-num_proxies]
+        return request.META.get('REMOTE_ADDR')
+
+
+class EmailThrottle(BucketThrottle):
+    """Throttle requests per email address in the request body."""
+
+    def get_ident_for(self, request):
+        email = request.data.get('email') \
+            if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return email.strip().lower()
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
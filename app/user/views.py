@@ -1,27 +1,34 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import (
+    LoginIPThrottle, LoginEmailThrottle, SignupIPThrottle)
 
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    # Checked before the password is hashed
+    throttle_classes = (SignupIPThrottle,)
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Checked before authenticate() hashes the password
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
 
-    # We're using token authentication
-    authentication_classes = (authentication.TokenAuthentication,)
+    # We're using token authentication, resolved from a cache
+    authentication_classes = (CachedTokenAuthentication,)
     # No special permissions needed, user just needs to be logged in
     permission_classes = (permissions.IsAuthenticated,)
 